@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+from pathlib import Path
+
+# Writes a pair of singlefiles that have the same layout as the game's, filled with made up
+# projects. Nothing in them has to make sense to the game, only to SkyCAT's parser.
+
+def animdata_block(name: str, is_creature: bool, hkx: int, clips: int, rnd: random.Random) -> tuple[list[str], list[str]]:
+    # anim data from the "1" after the line count, and the bound anims after their line count
+    hkx_files = [f"Actors\\{name}\\Behaviors\\Behavior{i}.hkx" for i in range(hkx)]
+    anims = ["1", str(len(hkx_files))] + hkx_files + ["1" if is_creature else "0"]
+
+    boundanims = []
+    if not is_creature:
+        return anims, boundanims
+
+    for clip in range(clips):
+        triggers = [f"Event{i}:{rnd.randint(0, 400) / 100}" for i in range(rnd.randint(0, 3))]
+        anims += [f"Clip{clip}", str(clip), "1", "0", "0", str(len(triggers))] + triggers + [""]
+
+        translations = [f"{t / 10} 0 {rnd.randint(0, 500)} 0" for t in range(rnd.randint(1, 4))]
+        rotations = [f"{t / 10} 0 0 0 1" for t in range(rnd.randint(1, 2))]
+        boundanims += [str(clip), f"{rnd.randint(5, 50) / 10}", str(len(translations))] + translations + [str(len(rotations))] + rotations + [""]
+
+    return anims, boundanims
+
+def animset_block(animsets: int, notes: int, rnd: random.Random) -> list[str]:
+    # set count, set names, then per set "V3" and four counted sections
+    set_names = [f"Set{i}.txt" for i in range(animsets)]
+    lines = [str(len(set_names))] + set_names
+
+    for _ in set_names:
+        lines.append("V3")
+
+        # one line per note
+        lines.append(str(notes))
+        lines += [f"Note{i}" for i in range(notes)]
+
+        # three lines per note
+        lines.append(str(notes))
+        for i in range(notes):
+            lines += [f"Variable{i}", "0", "1"]
+
+        # two lines and a counted list per note
+        lines.append(str(notes))
+        for i in range(notes):
+            n = rnd.randint(0, 2)
+            lines += [f"Attack{i}", "0", str(n)] + [f"Clip{j}" for j in range(n)]
+
+        # three crc lines per animation
+        files = rnd.randint(1, 2 * notes + 1)
+        lines.append(str(files))
+        for _ in range(files):
+            lines += [str(rnd.randint(1, 0xFFFFFFFF)), str(rnd.randint(1, 0xFFFFFFFF)), "7891816"]
+
+    return lines
+
+def generate(meshes_folder: Path, projects: int = 500, creature_ratio: float = 0.3, animsets: int = 2, notes: int = 2,
+             hkx: int = 3, clips: int = 8, prefix: str = "Bench", newline: str = "\r\n", seed: int = 1) -> tuple[list[str], list[str]]:
+    # returns the project names and the creature project names
+    rnd = random.Random(seed)
+    meshes_folder = Path(meshes_folder)
+
+    project_names = [f"{prefix}{i}Project" for i in range(projects)]
+    creature_names = [name for name in project_names if rnd.random() < creature_ratio]
+    creatures = set(creature_names)
+
+    animdata = [str(len(project_names))] + [f"{name}.txt" for name in project_names]
+    for name in project_names:
+        anims, boundanims = animdata_block(name, name in creatures, hkx, clips, rnd)
+        animdata += [str(len(anims))] + anims
+        if name in creatures:
+            animdata += [str(len(boundanims))] + boundanims
+
+    # the game's file doesn't have the blank line that would close the last bound anims
+    while animdata[-1] == "":
+        animdata.pop()
+
+    animsetdata = [str(len(creature_names))] + [f"{name}data\\{name}.txt" for name in creature_names]
+    for name in creature_names:
+        animsetdata += animset_block(animsets, notes, rnd)
+
+    os.makedirs(meshes_folder, exist_ok=True)
+    with open(meshes_folder / "animationdatasinglefile.txt", "wb") as writable:
+        writable.write((newline.join(animdata) + newline).encode("utf-8"))
+    with open(meshes_folder / "animationsetdatasinglefile.txt", "wb") as writable:
+        writable.write((newline.join(animsetdata) + newline).encode("utf-8"))
+
+    return project_names, creature_names
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Write synthetic animation singlefiles for benchmarking.")
+    parser.add_argument("meshes", type=Path, help="Folder to write the singlefiles to.")
+    parser.add_argument("-projects", type=int, default=500, help="Number of projects.")
+    parser.add_argument("-creatures", type=float, default=0.3, help="Share of projects that are creatures.")
+    parser.add_argument("-animsets", type=int, default=2, help="Animation sets per creature project.")
+    parser.add_argument("-notes", type=int, default=2, help="Notes in each section of an animation set.")
+    parser.add_argument("-hkx", type=int, default=3, help="Hkx files per project.")
+    parser.add_argument("-clips", type=int, default=8, help="Clips per creature project.")
+    parser.add_argument("-prefix", default="Bench", help="Start of every project name.")
+    parser.add_argument("-lf", action="store_true", help="Use LF line endings instead of CRLF.")
+    parser.add_argument("-seed", type=int, default=1)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    names, creature_names = generate(args.meshes, args.projects, args.creatures, args.animsets, args.notes, args.hkx,
+                                     args.clips, args.prefix, "\n" if args.lf else "\r\n", args.seed)
+    print(f"Wrote {len(names)} projects ({len(creature_names)} creatures) to {args.meshes}.")
@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+from datetime import datetime
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config, index, system, update
+import append, extract
+from CRC32 import CRC32
+
+import generate
+
+# bump this whenever the layout of the results file changes
+RESULTS_VERSION = 1
+
+SCENARIOS = ("update_cache_cold", "update_cache_warm", "extract_projects", "extract_all",
+             "append_projects", "save_backup", "load_backup", "crc32_update")
+
+class Workspace:
+    # A throwaway Data, cache and backups folder with its own config and Updater,
+    # set as the globals the same way __main__ does.
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.meshes = root / "Data" / "meshes"
+
+        self.cfg = config.Configurator()
+        self.cfg.skyrim = root / "Data"
+        self.cfg.cache = root / "cache"
+        self.cfg.backups = root / "backups"
+        os.makedirs(self.cfg.cache, exist_ok=True)
+        self.reset()
+
+    def reset(self):
+        # a new Updater, as if the program was started again
+        self.ud = update.Updater()
+        config.set_globals(self.cfg, self.ud, yes_im_sure=True)
+        return self.ud
+
+    def drop_index(self):
+        if (self.cfg.cache / index.index_file).exists():
+            os.remove(self.cfg.cache / index.index_file)
+
+    def drop_loose_projects(self):
+        for folder in (config.animdata_dir, config.animsetdata_dir):
+            shutil.rmtree(self.cfg.skyrim / folder, ignore_errors=True)
+
+def measure(scenario, repeat: int, setup=None) -> dict:
+    # setup runs before every run and isn't timed
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        # the commands print a line per project, that's not what we're timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            scenario()
+            runs.append(time.perf_counter() - start)
+
+    return {"runs": runs,
+            "min": min(runs),
+            "median": statistics.median(runs),
+            "mean": statistics.mean(runs)}
+
+def run_benchmarks(root: Path, args) -> dict:
+    params = {"projects": args.projects, "creatures": args.creatures, "animsets": args.animsets, "notes": args.notes,
+              "hkx": args.hkx, "clips": args.clips, "append": args.append, "extract": args.extract,
+              "crc_paths": args.crc_paths, "newline": "LF" if args.lf else "CRLF", "seed": args.seed}
+    newline = "\n" if args.lf else "\r\n"
+    wanted = args.only or SCENARIOS
+    results = {}
+
+    # the cache every scenario starts from
+    base = Workspace(root / "base")
+    project_names, creature_names = generate.generate(base.meshes, args.projects, args.creatures, args.animsets, args.notes,
+                                                      args.hkx, args.clips, "Bench", newline, args.seed)
+    pristine = root / "pristine"
+    shutil.copytree(base.meshes, pristine)
+
+    def restore_base():
+        shutil.copy2(pristine / config.animdata, base.meshes / config.animdata)
+        shutil.copy2(pristine / config.animsetdata, base.meshes / config.animsetdata)
+        base.drop_loose_projects()
+
+    def cold_update():
+        base.drop_index()
+        base.reset()
+
+    if "update_cache_cold" in wanted:
+        results["update_cache_cold"] = measure(lambda: base.ud.update_cache(), args.repeat, cold_update)
+
+    if "update_cache_warm" in wanted:
+        base.reset().update_cache()
+        results["update_cache_warm"] = measure(lambda: base.ud.update_cache(), args.repeat, base.reset)
+
+    # a spread of projects across the file, not just the first few
+    step = max(1, len(project_names) // max(1, args.extract))
+    some_projects = [name.lower() for name in project_names[::step][:args.extract]]
+
+    def fresh_extract():
+        base.drop_loose_projects()
+        base.reset().update_cache()
+
+    if "extract_projects" in wanted:
+        results["extract_projects"] = measure(lambda: extract.extract_projects(some_projects), args.repeat, fresh_extract)
+
+    if "extract_all" in wanted:
+        results["extract_all"] = measure(lambda: extract.extract_all(), args.repeat, fresh_extract)
+
+    if "append_projects" in wanted:
+        # loose projects to append come from extracting a second, smaller cache
+        mods = Workspace(root / "mods")
+        mod_names, _ = generate.generate(mods.meshes, args.append, args.creatures, args.animsets, args.notes,
+                                         args.hkx, args.clips, "Mod", newline, args.seed + 1)
+        mods.reset().update_cache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract.extract_all()
+
+        def fresh_append():
+            restore_base()
+            for folder in (config.animdata_dir, config.animsetdata_dir):
+                shutil.copytree(mods.cfg.skyrim / folder, base.cfg.skyrim / folder)
+            base.reset().update_cache()
+
+        results["append_projects"] = measure(lambda: append.append_projects([name.lower() for name in mod_names]),
+                                             args.repeat, fresh_append)
+        restore_base()
+
+    if "save_backup" in wanted or "load_backup" in wanted:
+        def fresh_backups():
+            shutil.rmtree(base.cfg.backups, ignore_errors=True)
+            base.reset().update_cache()
+
+        # every run starts from an empty backup folder, so each one stores the whole cache
+        saved = measure(system.save_backup, args.repeat, fresh_backups)
+        if "save_backup" in wanted:
+            results["save_backup"] = saved
+
+        def emptied_cache():
+            # the restore has to rebuild both files from the packs
+            for file in (config.animdata, config.animsetdata):
+                with open(base.meshes / file, "r+b") as writable:
+                    writable.truncate(0)
+            base.reset()
+
+        if "load_backup" in wanted:
+            results["load_backup"] = measure(system.load_backup, args.repeat, emptied_cache)
+        restore_base()
+
+    if "crc32_update" in wanted:
+        # the folder and file names animsetdata hashes, lowercased the way the game does
+        paths = [f"meshes\\actors\\{name}\\animations\\attack{i}".lower().encode("utf-8")
+                 for i in range(args.crc_paths // max(1, len(project_names)) + 1) for name in project_names][:args.crc_paths]
+
+        def hash_paths():
+            update_crc = CRC32.update
+            for path in paths:
+                update_crc(path)
+
+        results["crc32_update"] = measure(hash_paths, args.repeat)
+
+    sizes = {"animdata_bytes": os.path.getsize(pristine / config.animdata),
+             "animsetdata_bytes": os.path.getsize(pristine / config.animsetdata),
+             "projects": len(project_names),
+             "creatures": len(creature_names)}
+
+    return {"version": RESULTS_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+            "files": sizes,
+            "results": results}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time SkyCAT's main commands on a synthetic cache.")
+    parser.add_argument("-projects", type=int, default=2000, help="Projects in the generated cache.")
+    parser.add_argument("-creatures", type=float, default=0.3, help="Share of projects that are creatures.")
+    parser.add_argument("-animsets", type=int, default=2, help="Animation sets per creature project.")
+    parser.add_argument("-notes", type=int, default=2, help="Notes in each section of an animation set.")
+    parser.add_argument("-hkx", type=int, default=3, help="Hkx files per project.")
+    parser.add_argument("-clips", type=int, default=8, help="Clips per creature project.")
+    parser.add_argument("-append", type=int, default=20, help="Projects to append.")
+    parser.add_argument("-extract", type=int, default=20, help="Projects to extract by name.")
+    parser.add_argument("-crc_paths", type=int, default=100000, help="Paths to hash with CRC32.")
+    parser.add_argument("-lf", action="store_true", help="Use LF line endings instead of CRLF.")
+    parser.add_argument("-seed", type=int, default=1)
+    parser.add_argument("-repeat", type=int, default=5, help="Timed runs per scenario.")
+    parser.add_argument("-only", nargs="+", choices=SCENARIOS, help="Only run these scenarios.")
+    parser.add_argument("-output", type=Path, help="Write the results to this JSON file as well.")
+    parser.add_argument("-workdir", type=Path, help="Generate the cache here and keep it, instead of in a temp folder.")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.workdir is not None:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+        os.makedirs(args.workdir)
+        report = run_benchmarks(args.workdir.resolve(), args)
+    else:
+        with tempfile.TemporaryDirectory(prefix="skycat_bench_") as workdir:
+            report = run_benchmarks(Path(workdir), args)
+
+    for scenario, result in report["results"].items():
+        print(f"{scenario:<20} min {result['min'] * 1000:10.2f} ms   median {result['median'] * 1000:10.2f} ms")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as writable:
+            json.dump(report, writable, indent=2)
+        print(f"Results written to {args.output}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
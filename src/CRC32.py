@@ -1,6 +1,13 @@
 # Note: This CRC32 implementation is based on the implementation used in TESV Skyrim.
 # This code was adapted to Python from Pentalimbed's Haviour tool.
 
+from collections import OrderedDict
+import json
+import logging
+import os
+from pathlib import Path
+import zlib
+
 
 def mirror_bit(val, num):
 
@@ -53,33 +60,203 @@ class CRC32:
     # Class variable to track if table was generated
     _table_generated = False
 
+    # Set at import time, True if zlib's C kernel gives the same results as our table
+    _use_zlib = False
+
     @staticmethod
-    def update(
-        data: bytes, # Pointer to input data
-        initial: int = 0, # Starting CRC value (default 0)
-        final_xor: int = 0 # Final XOR value (default 0)
-    ):
-        # Ensure the lookup table is only generated once
+    def hkx_fourcc(data: bytes, final_xor: int = 0):
+        # Special-case: "hkx" appears to be stored as a little-endian 32-bit fourcc 
+        # (e.g. b'hkx' -> 0x00786B68).
+        # Return that directly instead of computing a CRC for those short strings.
+        padded = data.ljust(4, b"\x00")
+        return int.from_bytes(padded, byteorder='little') ^ final_xor
+
+    @staticmethod
+    def update_table(data: bytes, initial: int = 0):
+        # Plain table-driven CRC, one byte at a time. Only used to check the fast path.
         if not CRC32._table_generated:
             CRC32.generate_table(table=CRC32.table)
             CRC32._table_generated = True
-        
-        # Start with the initial CRC value
+
+        table = CRC32.table
         c = initial
 
-        # Special-case: "hkx" appears to be stored as a little-endian 32-bit fourcc 
-        # (e.g. b'hkx' -> 0x00786B68).
-        # Return that directly instead of computing a CRC for those short strings.
+        for byte in data:
+            # XOR the lowest byte of c with the current byte, shift c right by 8 bits
+            # and XOR with the pre-calculated table value
+            c = (c >> 8) ^ table[(c & 0xFF) ^ byte]
+
+        return c
+
+    @staticmethod
+    def update(
+        data: bytes, # Pointer to input data
+        initial: int = 0, # Starting CRC value (default 0)
+        final_xor: int = 0 # Final XOR value (default 0)
+    ):
         if data == b'hkx':
-            padded = data.ljust(4, b"\x00")
-            return int.from_bytes(padded, byteorder='little') ^ final_xor
+            return CRC32.hkx_fourcc(data, final_xor)
 
-        for byte in data:
-            # old_c = c
-            table_index = (c & 0xFF) ^ byte # XOR the lowest byte of c with the current byte
-            shifted_crc = c >> 8 # Shift c right by 8 bits
-            table_value = CRC32.table[table_index] # Lookup pre-calculated value from table
-            c = shifted_crc ^ table_value # Update c with XOR of shifted value and table value
+        if CRC32._use_zlib:
+            # The table is the reflected 0x04C11DB7 table zlib uses, but zlib inverts the
+            # CRC before and after the loop. Undo both inversions to get Skyrim's raw CRC.
+            c = zlib.crc32(data, initial ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+        else:
+            c = CRC32.update_table(data, initial)
 
         # XOR with final value and return
-        return c ^ final_xor
\ No newline at end of file
+        return c ^ final_xor
+
+    @staticmethod
+    def crc_many(items: list[bytes], initial: int = 0, final_xor: int = 0) -> list[int]:
+        # Hash a whole list of folder or file names in one call
+        if not CRC32._use_zlib:
+            return [CRC32.update(data, initial, final_xor) for data in items]
+
+        crc32 = zlib.crc32
+        hkx_fourcc = CRC32.hkx_fourcc
+        start = initial ^ 0xFFFFFFFF
+        end_xor = 0xFFFFFFFF ^ final_xor
+
+        return [hkx_fourcc(data, final_xor) if data == b'hkx' else crc32(data, start) ^ end_xor
+                for data in items]
+
+
+# Build the lookup table once at import time
+CRC32.generate_table(table=CRC32.table)
+CRC32._table_generated = True
+
+# Only trust zlib if it agrees with our own table on a known string
+CRC32._use_zlib = (zlib.crc32(b"123456789", 0xFFFFFFFF) ^ 0xFFFFFFFF) == CRC32.update_table(b"123456789")
+
+
+class CRCCache:
+    # Bounded LRU memo in front of CRC32.update, keyed on the normalized path component.
+    # Animation sets repeat the same folders thousands of times, so most lookups are hits.
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.loaded_from = None
+
+    @staticmethod
+    def normalize(component: str) -> str:
+        return component.strip().lower().replace("/", "\\")
+
+    def get(self, component: str) -> int:
+        key = CRCCache.normalize(component)
+        entries = self.entries
+
+        crc = entries.get(key)
+        if crc is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return crc
+
+        self.misses += 1
+        crc = CRC32.update(key.encode("utf-8"))
+        entries[key] = crc
+        self.dirty = True
+
+        # drop the least recently used entry once we're over the limit
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        return crc
+
+    def get_many(self, components: list[str]) -> list[int]:
+        # the hits come from the memo, the misses are hashed together in one CRC32.crc_many call
+        keys = [CRCCache.normalize(component) for component in components]
+        entries = self.entries
+        missing = [key for key in dict.fromkeys(keys) if key not in entries]
+        fresh = dict(zip(missing, CRC32.crc_many([key.encode("utf-8") for key in missing])))
+
+        crcs = []
+        for key in keys:
+            if key in fresh:
+                crcs.append(fresh[key])
+            else:
+                self.hits += 1
+                entries.move_to_end(key)
+                crcs.append(entries[key])
+
+        if fresh:
+            self.misses += len(fresh)
+            entries.update(fresh)
+            self.dirty = True
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        return crcs
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def load(self, path: Path):
+        # only read the saved memo once per run
+        if self.loaded_from == path:
+            return 0
+        self.loaded_from = path
+
+        try:
+            with open(path, "r", encoding="utf-8") as readable:
+                saved = json.load(readable)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logging.debug(f"Ignoring unreadable CRC cache {path}: {e}")
+            return 0
+
+        for key, crc in saved.items():
+            if key not in self.entries:
+                self.entries[key] = int(crc)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return 0
+
+    def save(self, path: Path):
+        # nothing new since the last load or save
+        if not self.dirty:
+            return 0
+
+        tmpfile = Path(str(path) + ".tmp")
+        try:
+            os.makedirs(Path(path).parent, exist_ok=True)
+            with open(tmpfile, "w", encoding="utf-8") as writable:
+                json.dump(self.entries, writable, separators=(",", ":"))
+            os.replace(tmpfile, path)
+            self.dirty = False
+        except OSError as e:
+            # the memo is only an accelerator, failing to save it is not fatal
+            logging.warning(f"Could not save CRC cache: {e}")
+        return 0
+
+# Shared for the whole run, saved to this file in the cache folder between runs
+crc_cache = CRCCache()
+memo_file = Path("crc_cache.json")
+
+def split_hkx_path(path: str) -> tuple[str, str, str]:
+    # "Data\\Meshes\\Actors\\Dog\\Animations\\Run.hkx" -> ("meshes\\actors\\dog\\animations", "run", "hkx")
+    path = CRCCache.normalize(path)
+
+    # paths are stored relative to the Data folder
+    meshes = path.find("meshes\\")
+    if meshes > 0:
+        path = path[meshes:]
+
+    folder, _, filename = path.rpartition("\\")
+    stem, dot, extension = filename.rpartition(".")
+    if not dot:
+        stem, extension = extension, ""
+    return folder, stem, extension
+
+def get_checksum(path: str, memo: CRCCache = crc_cache) -> tuple[int, int, int]:
+    # the three lines animsetdata stores for every animation: folder, file name and extension
+    folder, stem, extension = split_hkx_path(path)
+    return memo.get(folder), memo.get(stem), memo.get(extension)
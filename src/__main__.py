@@ -1,11 +1,12 @@
 import logging
+import multiprocessing
 import sys
 import argparse
 from pathlib import Path
 
-import config, cache, errors, system, update, util
+import config, cache, errors, system, timing, update, util
 
-import extract, append
+import extract, append, lookup
 
 
 def build_parser():
@@ -29,6 +30,13 @@ def build_parser():
   parser.add_argument("-ireallymeanit",
                       action='store_true')
 
+  parser.add_argument("-jobs",
+                      type=int,
+                      default=1,
+                      help='Number of worker processes to extract with. Only asks once before overwriting.\n'
+                      'For example: "-extractall -jobs 8"',
+                      metavar='N')
+
   parser.add_argument("-append",
                       nargs='+',
                       help='Append one or more projects to the animation cache.\n'
@@ -43,8 +51,32 @@ def build_parser():
                       action='store_true')
   
   parser.add_argument("-restore",
-                      help="Restore the animation cache from the latest backup.",
+                      help="Restore the animation cache from a backup. Restores the latest backup if no id is given.",
+                      action='store',
+                      nargs='?',
+                      const='latest',
+                      default=None,
+                      metavar='SNAPSHOT')
+
+  parser.add_argument("-listbackups",
+                      help="List every saved backup with its id.",
+                      action='store_true')
+
+  parser.add_argument("-prunebackups",
+                      help="Delete old backups. Keeps the 10 newest unless \"-keep\" or \"-maxage\" is given.",
                       action='store_true')
+
+  parser.add_argument("-keep",
+                      type=int,
+                      default=None,
+                      help="Number of backups to keep when pruning.",
+                      metavar='N')
+
+  parser.add_argument("-maxage",
+                      type=float,
+                      default=None,
+                      help="Delete backups older than this many days when pruning.",
+                      metavar='DAYS')
   
   parser.add_argument("-restorefromarchive",
                       help="Restore the vanilla animation cache from the program archive.",
@@ -55,6 +87,22 @@ def build_parser():
                       action='store_true')
   
   # addon commands
+  parser.add_argument("-crc32",
+                      help="Create a CRC32 checksum from a string.",
+                      action='store',
+                      metavar='STRING')
+
+  parser.add_argument("-getchecksum",
+                      nargs='+',
+                      help='Get the CRC32 checksum series (folder, file, extension) for one or more animation paths.\n'
+                      'For example: "-getchecksum meshes\\actors\\dog\\animations\\run.hkx"',
+                      metavar='PATH')
+
+  parser.add_argument("-buildvanillaindex",
+                      action='store_true',
+                      help="Index the vanilla animation cache kept in the cache folder, or the current cache if it is untouched vanilla.\n"
+                      "Updates then skip parsing the vanilla projects. Done automatically by -restorefromarchive.")
+
   parser.add_argument("-cd",
                       help="Change the data directory.",
                       action='store',
@@ -63,6 +111,17 @@ def build_parser():
                       default=None,
                       metavar='PATH')
   
+  parser.add_argument("-resolvepaths",
+                      nargs='*',
+                      default=None,
+                      help='Resolve the animation checksums of one or more creature projects back to .hkx paths.\n'
+                      'Resolves every creature project if no names are given. Results are dumped to JSON.',
+                      metavar='PROJECT')
+
+  parser.add_argument("-rebuildlookup",
+                      action='store_true',
+                      help="Rebuild the checksum lookup from meshes and the animation archive before resolving paths.")
+
   # debug helpers
   parser.add_argument("-yesimsure",
                       action='store_true',
@@ -81,6 +140,14 @@ def build_parser():
   parser.add_argument("-dryrun",
                       action='store_true',
                       help="Run the program in dry run mode, where no actual changes are made to files.")
+
+  parser.add_argument("-timings",
+                      action='store_true',
+                      help="Print how long each step took and how much was read and written when done.")
+
+  parser.add_argument("-profile",
+                      action='store_true',
+                      help="Run the commands under cProfile and save the stats as a .pstats file in the cache folder.")
   return parser
 
 def has_cli_actions(parsed_args) -> bool:
@@ -96,7 +163,13 @@ def has_cli_actions(parsed_args) -> bool:
         parsed_args.gui,
         parsed_args.backup,
         parsed_args.restore,
-        parsed_args.restorefromarchive
+        parsed_args.listbackups,
+        parsed_args.prunebackups,
+        parsed_args.restorefromarchive,
+        parsed_args.crc32,
+        parsed_args.getchecksum,
+        parsed_args.buildvanillaindex,
+        parsed_args.resolvepaths is not None
     ])
 
 
@@ -132,20 +205,26 @@ def process_cli(args):
         cache.restore_vanilla_cache()
 
     if args.restore:
-        system.load_backup()
+        system.load_backup(snapshot_id=None if args.restore == 'latest' else args.restore)
+
+    if args.listbackups:
+        system.list_backups()
+
+    if args.prunebackups:
+        system.prune_backups(keep=args.keep, max_age_days=args.maxage)
 
     if args.update:
         ud.update_cache()
 
     if args.extract:
         # extract may be a list of project names
-        extract.extract_projects(listprojects=args.extract)
+        extract.extract_projects(listprojects=args.extract, jobs=args.jobs)
 
     if args.extractall:
         if args.ireallymeanit:
-            extract.extract_all(and_i_mean_all_of_them=True)
+            extract.extract_all(and_i_mean_all_of_them=True, jobs=args.jobs)
         else:
-            extract.extract_all()
+            extract.extract_all(jobs=args.jobs)
 
     if args.append:
         append.append_projects(project_list=args.append)
@@ -153,8 +232,25 @@ def process_cli(args):
 
     if args.appendall:
         append.append_all_available()
+
+    if args.crc32:
+        cache.get_crc32(args.crc32)
+
+    if args.getchecksum:
+        cache.get_checksums(args.getchecksum)
+
+    if args.resolvepaths is not None:
+        lookup.annotate_animsets(listprojects=args.resolvepaths, rebuild=args.rebuildlookup)
+
+    if args.buildvanillaindex:
+        cache.build_vanilla_index()
     return 0
 
+def run_profiled(args):
+    cfg = config.get_global('config')
+    with timing.profiled(cfg.cache):
+        return process_cli(args)
+
 # only runs this when you open the application
 # commands can also be accessed from the command line
 def interactive_loop(args=None):
@@ -174,9 +270,14 @@ def interactive_loop(args=None):
                       "  append [projects]      - Append one or more projects to the animation cache.\n",
                       "  appendall              - Append all available projects to the animation cache.\n",
                       "  backup                 - Create a backup of the current animation cache.\n",
-                      "  restore                - Restore the animation cache from the latest backup.\n",
+                      "  restore [snapshot]     - Restore the animation cache from a backup, the latest one by default.\n",
+                      "  backups                - List every saved backup.\n",
+                      "  prunebackups [N]       - Delete all but the N newest backups (10 by default).\n",
                       "  restorefromarchive     - Restore the vanilla animation cache from the program archive.\n",
                       "  dumpjson               - Dump the current animation cache data to a JSON file.\n",
+                      "  crc32 [string]         - Create a CRC32 checksum from a string.\n",
+                      "  getchecksum [paths]    - Get the CRC32 checksum series for one or more animation paths.\n",
+                      "  resolvepaths [projects] - Resolve animation checksums back to .hkx paths and dump them to JSON.\n",
                       "  level [LEVEL]         - Set the logging level (e.g., DEBUG, INFO, WARNING, ERROR).\n",)
 
             case "update":
@@ -223,13 +324,27 @@ def interactive_loop(args=None):
                 except Exception:
                     logging.exception(f"Failed to backup cache.")
 
-            case "restore":
+            case _ if inp == "restore" or inp.startswith("restore "):
                 try:
                     logging.info("Restoring cache backup...")
-                    system.load_backup()
+                    snapshot_id = inp.split(" ", 1)[1].strip() if " " in inp else None
+                    system.load_backup(snapshot_id=snapshot_id)
                 except Exception:
                     logging.exception(f"Failed to restore saved cache.")
 
+            case "backups":
+                try:
+                    system.list_backups()
+                except Exception:
+                    logging.exception(f"Failed to list backups.")
+
+            case _ if inp == "prunebackups" or inp.startswith("prunebackups "):
+                try:
+                    keep = int(inp.split(" ", 1)[1]) if " " in inp else None
+                    system.prune_backups(keep=keep)
+                except Exception:
+                    logging.exception(f"Failed to prune backups.")
+
             case "restorefromarchive":
                 try:
                     logging.info("Restoring vanilla cache from archive...")
@@ -253,6 +368,26 @@ def interactive_loop(args=None):
                 except Exception:
                     logging.exception(f"Failed to dump cache to JSON.")
 
+            case _ if inp.startswith("crc32 "):
+                try:
+                    cache.get_crc32(inp.split(" ", 1)[1])
+                except Exception:
+                    logging.exception(f"Failed to create checksum.")
+
+            case _ if inp.startswith("getchecksum "):
+                try:
+                    cache.get_checksums(inp.split(" ", 1)[1].split(" "))
+                except Exception:
+                    logging.exception(f"Failed to get checksums.")
+
+            case _ if inp == "resolvepaths" or inp.startswith("resolvepaths "):
+                try:
+                    logging.info("Resolving animation paths...")
+                    project_list = inp.split(" ", 1)[1].split(" ") if " " in inp else None
+                    lookup.annotate_animsets(listprojects=project_list)
+                except Exception:
+                    logging.exception(f"Failed to resolve animation paths.")
+
             case "changedir" | "cd":
                 try:
                     logging.info("Changing data directory...")
@@ -290,7 +425,12 @@ def main(argv=None):
 
     # check for command-line args
     if has_cli_actions(args):
-        process_cli(args)
+        if args.profile:
+            run_profiled(args)
+        else:
+            process_cli(args)
+        if args.timings:
+            print(timing.summary())
         if not args.gui:
             return 0
         if args.noupdate:
@@ -306,6 +446,8 @@ def main(argv=None):
     return 0
 
 if __name__ == "__main__":
+    # frozen builds start worker processes through this script too
+    multiprocessing.freeze_support()
     try:
         raise SystemExit(main())
     except KeyboardInterrupt:
@@ -1,10 +1,10 @@
 import logging
 import os
 from pathlib import Path
-from shutil import copy2
 
-import config, cache, errors, system, util
+import config, cache, errors, index, project, system, timing, util, writer
 
+@timing.span("append_projects")
 def append_projects(project_list: list[str], dryrun: bool = False):
     cfg = config.get_global('config')
     ud = config.get_global('update')
@@ -44,253 +44,114 @@ def append_projects(project_list: list[str], dryrun: bool = False):
                 system.save_backup()
 
 
-    if ud.animdata_list is None or ud.animsetdata_list is None:
+    creatures_dict = cache.get_creature_projects(project_list)
+    appended_creatures = [project_name for project_name in project_list if creatures_dict.get(project_name)]
+    had_a_creature = bool(appended_creatures)
+
+    # the animsetdata is only parsed if a creature is added to it, otherwise the file stays as it is
+    if ud.animdata_list is None or (had_a_creature and ud.animsetdata_list is None):
         if ud.update_cache() != 0:
             raise errors.CacheError(message="Unable to update cache, cannot append projects.")
         return 1
     
     animdata_list = ud.animdata_list
-    animsetdata_list = ud.animsetdata_list
-
-    # if not animdata_list:
-    #     last_project_is_creature = False
-    # else:
-    #     last = animdata_list[-1]
-    #     # handle dict-like row or plain string
-    #     project_name = last.get('project_name') if isinstance(last, dict) and 'project_name' in last else str(last)
-    #     last_project_is_creature = cache.is_creature(project_name)
-
-    try: 
-        last_project_is_creature = True if animdata_list[-1]["project_type"] == "creature" else False
-    except (IndexError, KeyError) as e:
-        raise errors.CacheError(message="Animation data cache is corrupted or empty, cannot append projects.") from e
-
-    count_projects = len(animdata_list) + len(project_list)
-    count_creatures = len(animsetdata_list)
-    creatures_dict = cache.get_creature_projects(project_list)
-    count_creatures += sum(1 for p in project_list if creatures_dict.get(p))
-
-    # open old cache files
-    old_animdata = cfg.skyrim / 'meshes' / config.animdata
-    old_animsetdata = cfg.skyrim / 'meshes' / config.animsetdata
-    
-    # create temporary cache folder
-    os.makedirs(cfg.cache / "temp", exist_ok=True)
-
-    temp_animdata = cfg.cache / "temp" / "animationdatasinglefile.txt"
-    temp_animsetdata = cfg.cache / "temp" / "animationsetdatasinglefile.txt"
-
-    # //// COPYING OLD FILES ////
-
-    # copy over old animdata file to temp cache file by line
-    with open(temp_animdata, 'w', encoding="utf-8") as t_animdata:
-        with open(old_animdata, 'r', encoding="utf-8") as o_animdata:
-            readline = o_animdata.readline
-            strip = str.strip
-
-            try:
-                o_animdata.readline()  # skip first line
-
-                # write new project count
-                t_animdata.write(f"{count_projects}")
+    animsetdata_list = ud.animsetdata_list if had_a_creature else None
 
-                # copy existing project names
-                for _ in range(len(animdata_list)):
-                    t_animdata.write("\n" + strip(readline()))
-                
-                # append each new project name NO NEWLINE
-                for project_name in project_list:
-                    t_animdata.write("\n" + project_name + ".txt")
+    if not animdata_list:
+        raise errors.CacheError(path=str(cfg.skyrim / "meshes" / config.animdata), message="Animation data cache is empty, cannot append projects.")
 
-                # copy everything else
-                for line in o_animdata:
-                    t_animdata.write("\n" + strip(line))
+    # old cache files
+    meshes_dir = cfg.skyrim / "meshes"
+    old_animdata = meshes_dir / config.animdata
+    old_animsetdata = meshes_dir / config.animsetdata
 
-            except (OSError, PermissionError) as e:
-                raise errors.WriteError(path=str(old_animdata), message=f"Error copying from old animdata file: {e}") from e
-    
-            # copy over old animsetdata file to temp cache file by line
-            with open(temp_animsetdata, 'w', encoding="utf-8") as t_animsetdata:
-                with open(old_animsetdata, 'r', encoding="utf-8") as o_animsetdata:
-                    
-                    try:
-                        # write new project count
-                        t_animsetdata.write(f"{count_creatures}")
-
-                        util.fast_skip(o_animsetdata)  # skip first line
-
-                        # copy existing project names
-                        for _ in range(len(animsetdata_list)):
-                            t_animsetdata.write("\n" + strip(o_animsetdata.readline()))
-                        
-                        # append the new project names only if they are creatures
-                        for project_name in project_list:
-                            if creatures_dict.get(project_name):
-                                t_animsetdata.write("\n" + project_name + "data\\" + project_name + ".txt")
-
-                        # copy everything else
-                        for line in o_animsetdata:
-                            t_animsetdata.write("\n" + line.strip())
-                            
-                    except (OSError, PermissionError) as e:
-                        raise errors.WriteError(path=str(old_animsetdata), message=f"Error copying from old animsetdata file: {e}") from e
-
-
-
-    # //// MERGING NEW PROJECTS ////
-    for project_name in project_list:
+    # the new files are staged on the same drive as the old ones, so they can be swapped in with a rename
+    temp_folder = system.temp_folder()
+    temp_animdata = temp_folder / config.animdata
+    temp_animsetdata = temp_folder / config.animsetdata
 
-        logging.debug(f"Appending {project_name}.")
+    try:
+        os.makedirs(temp_folder, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(temp_folder), message=f"Could not create temporary directory: {e}") from e
 
-        # check again to make sure the files exist
-        proj_animdata = cfg.skyrim / "meshes" / "animationdata" / f"{project_name}.txt"
+    newline = read_newline(old_animdata)
 
-        if not proj_animdata.exists():
-            raise FileNotFoundError(f"Missing animation data for {project_name}")
+    # the old names are kept as they are, the old blocks are copied without being parsed again
+    old_names, animdata_body_start = read_header(old_animdata)
+    old_creature_names, animsetdata_body_start = read_header(old_animsetdata) if had_a_creature else ([], None)
 
-        # will fail silently if its not a creature
-        proj_boundanims = cfg.skyrim / "meshes" / "animationdata" / "boundanims" / f"anims_{project_name}.txt"
-        proj_animsetdata = cfg.skyrim / "meshes" / "animationsetdata" / f"{project_name}data" / f"{project_name}.txt"
+    # the stored hashes of the old blocks, so the copied ones don't have to be hashed again
+    saved = index.load_index(cfg.cache, meshes_dir, old_animdata, old_animsetdata)
+    animdata_blocks = saved.get("animdata_blocks") if saved is not None else None
+    animsetdata_blocks = saved.get("animsetdata_blocks") if saved is not None else None
 
-        if proj_boundanims.exists() and proj_animsetdata.exists():
-            is_creature = True
+    try:
+        # //// WRITING NEW FILES ////
+
+        # the animsetdata file only changes if we added a creature
+        with timing.span("write"), writer.SinglefileWriter(temp_animdata, temp_animsetdata if had_a_creature else None, newline) as out:
+            out.write_headers(old_names + [f"{project_name}.txt" for project_name in project_list],
+                              old_creature_names + [f"{project_name}data\\{project_name}.txt" for project_name in appended_creatures])
+
+            out.copy_animdata(old_animdata, animdata_body_start, os.path.getsize(old_animdata), animdata_list,
+                              animdata_blocks["hashes"] if animdata_blocks else None)
+            if had_a_creature:
+                out.copy_animsetdata(old_animsetdata, animsetdata_body_start, os.path.getsize(old_animsetdata), animsetdata_list,
+                                     animsetdata_blocks["hashes"] if animsetdata_blocks else None)
+
+            # //// MERGING NEW PROJECTS ////
+            for project_name in project_list:
+                logging.debug(f"Appending {project_name}.")
+                out.write_project(read_loose_project(project_name, creatures_dict.get(project_name), newline))
+                print(f"Successfully appended {project_name}.")
+
+        # //// VALIDATION ////
+
+        # every new block was checked as it was written, and the writer moved the old rows along
+        # with their blocks. if the old file had anything after its last block the rows couldn't
+        # follow it, so the whole file is read again.
+        new_animdata_list = out.animdata_rows
+        written = {"animdata": out.animdata_written()}
+        if new_animdata_list is None:
+            logging.debug("Old animdata has trailing data, validating the whole file.")
+            new_animdata_list = ud.read_animdata(temp_animdata)
+
+        new_creatures = [entry.project_name.casefold() for entry in new_animdata_list if entry.is_creature]
+
+        if not had_a_creature:
+            # the old file stays, and so does what the index knows about it
+            new_animsetdata_list = None
+            if saved is not None:
+                written["animsetdata"] = {"fingerprint": saved["animsetdata"], "blocks": animsetdata_blocks,
+                                          "columns": saved["animsetdata_list"]}
         else:
-            is_creature = False
+            new_animsetdata_list = out.animsetdata_rows
+            written["animsetdata"] = out.animsetdata_written()
+            if new_animsetdata_list is None:
+                logging.debug("Old animsetdata has trailing data, validating the whole file.")
+                new_animsetdata_list = ud.read_animsetdata(temp_animsetdata, new_creatures)
 
-        # if the last project was a creature, skip a line
-        with open(temp_animdata, 'a',encoding="utf-8") as t_animdata:
-            try:
-                if last_project_is_creature:
-                    t_animdata.write("\n")  
-
-                with open(proj_animdata, 'r', encoding="utf-8") as p_animdata:
-                    readline = p_animdata.readline
-                    strip = str.strip
-
-                    lines_animdata = util.count_lines_and_strip(proj_animdata)
-                    
-                    try:
-                        debug_line = 0
-
-                        # append line count NO NEWLINE
-                        if is_creature: 
-                            t_animdata.write(f"\n{lines_animdata + 1}") # +1 required for creatures
-                        else:
-                            t_animdata.write(f"\n{lines_animdata}")
-                    
-                        # append each line to the temp cache file
-                        for _ in range(lines_animdata):
-                            t_animdata.write("\n")
-                            t_animdata.write(strip(readline()))
-                            debug_line += 1
-                    except (OSError, PermissionError) as e:
-                        raise errors.WriteError(path=str(proj_animdata), message=f"Error appending animation data for {project_name} at line {debug_line}: {e}") from e
-
-
-                    # append boundanims
-                    if is_creature:
-                        with open(proj_boundanims, 'r', encoding="utf-8") as p_boundanims:
-
-                            debug_line = 0
-
-                            lines_boundanims = util.count_lines_and_strip(proj_boundanims)
-
-                            t_animdata.write(f"\n\n{lines_boundanims + 1}") # +1 required here as well
-
-                            for _ in range(lines_boundanims):
-                                t_animdata.write("\n")
-                                t_animdata.write(p_boundanims.readline().strip())
-                                debug_line += 1
-            except (OSError, PermissionError) as e:
-                raise errors.WriteError(path=str(proj_animdata), message=f"Error writing animation data for {project_name} at line {debug_line}: {e}") from e
+            if len(new_animsetdata_list) != len(new_creatures):
+                raise errors.CacheError(path=str(temp_animsetdata), message="Creature projects in the new animdata and animsetdata don't match.")
 
-        # append animsetdata
-        if is_creature:
+        # //// COMMIT ////
 
-            had_a_creature = True
-            last_project_is_creature = True
+        if not dryrun:
+            # swap the new files in together, if either one fails both are put back
+            if had_a_creature:
+                system.replace_files([(temp_animsetdata, old_animsetdata), (temp_animdata, old_animdata)])
+            else:
+                system.replace_files([(temp_animdata, old_animdata)])
 
-            try:
-                # convert creatureprojectdata txt to list
-                with open (proj_animsetdata, 'r') as p_animsetdata:
-                    readline = p_animsetdata.readline
-                    strip = str.strip
-
-                    debug_line = 0
-                    files_animsetdata = []
-                    expected_file_count = util.count_lines_and_strip(proj_animsetdata)
-
-                    for _ in range(expected_file_count):
-                        files_animsetdata.append(strip(readline()))
-            except IOError as e:
-                raise errors.ReadError(path=str(proj_animsetdata), message=f"Error reading animsetdata for {project_name}: {e}") from e
-
-            with open(temp_animsetdata, 'a', encoding="utf-8") as t_animsetdata:
-                try:
-                    strip = str.strip
-
-                    # append file count
-                    t_animsetdata.write(f"\n{expected_file_count}")
-
-                    # append projectdata list contents to tmp animsetdata cache
-                    for entry in files_animsetdata:
-                        # skip any blank lines
-                        if entry.strip() == "\n":
-                            continue
-                        t_animsetdata.write(f"\n{entry}")
-                    
-                except (OSError, PermissionError) as e:
-                    raise errors.WriteError(path=str(temp_animsetdata), message=f"Error writing animsetdata for {project_name}: {e}") from e
-
-                for entry in files_animsetdata:
-                    entry_file = Path(cfg.skyrim / "meshes" / "animationsetdata" / f"{project_name}data" / f"{entry}".strip())  # verify path exists
-
-                    if not entry_file.exists():
-                        raise FileNotFoundError(f"Missing animsetdata entry file for {project_name}: {entry_file}")
-
-                        # copy contents from each txt to tmp animsetdata cache
-                    with open(entry_file, 'r', encoding="utf-8") as p_file:
-                        try:
-                            debug_line = 0
-                            
-                            for _ in range(util.count_lines_and_strip(entry_file)):
-                                t_animsetdata.write("\n")
-                                t_animsetdata.write(p_file.readline().strip())
-                                debug_line += 1
-
-                        except (OSError, PermissionError) as e:
-                            raise errors.WriteError(path=str(entry_file), message=f"Error appending animsetdata for {project_name} at line {debug_line}: {e}") from e
+            ud.set_tables(new_animdata_list, new_animsetdata_list, written)
         else:
-            last_project_is_creature = False
-        print(f"Successfully appended {project_name}.")
-
-    # //// POST PROCESSING ////
-
-    # extra newline at the very end
-    with open(temp_animdata, 'a', encoding="utf-8") as t_animdata:
-        t_animdata.write("\n")
+            logging.info("Dry run complete. No changes were made.")
+            util.pause_wait_for_input()
 
-    with open(temp_animsetdata, 'a', encoding="utf-8") as t_animsetdata:
-        t_animsetdata.write("\n")
-
-    # validate tmp cache files
-    if ud.update_cache(cfg.cache / "temp") != 0:
-        raise errors.CacheError(message="Failed to validate new cache files. Cancelling...")
-
-    if not dryrun:
-        # copy tmp cache files to real cache files
-        copy2(temp_animdata, cfg.skyrim / "meshes" / config.animdata)
-
-        if had_a_creature:
-            copy2(temp_animsetdata, cfg.skyrim / "meshes" / config.animsetdata)
-
-    else:
-        logging.info("Dry run complete. No changes were made.")
-        util.pause_wait_for_input()
-
-    # clean up tmp files
-    if system.clean_temp() != 0:
-        raise OSError("Failed to clean temporary files.")
+    finally:
+        # clean up tmp files
+        system.clean_temp()
 
     return 0
 
@@ -314,4 +175,89 @@ def append_all_available():
                     logging.warning(f"{project_name} cannot be merged, skipping.")
     except OSError as e:
         raise errors.CacheError(path=str(animdata_dir), message=f"Failed to get projects from the animation data directory: {e}") from e
-    return append_projects(project_list)
\ No newline at end of file
+    return append_projects(project_list)
+
+def read_newline(file: Path) -> bytes:
+    # the line ending used by a singlefile, new blocks have to use the same one
+    try:
+        with open(file, 'rb') as readable:
+            count_line = readable.readline()
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(file), message=f"Could not read {file}: {e}") from e
+    return b"\r\n" if count_line.endswith(b"\r\n") else b"\n"
+
+def read_header(file: Path) -> tuple[list[str], int]:
+    # the project names listed at the top of a singlefile, and the offset its first block starts at
+    try:
+        with open(file, 'rb') as readable:
+            count_line = readable.readline()
+            count = int(count_line.strip())
+            names = [readable.readline().rstrip(b"\r\n").decode("utf-8") for _ in range(count)]
+            body_start = readable.tell()
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(file), message=f"Could not read {file}: {e}") from e
+    except ValueError as e:
+        raise errors.ParseError(path=str(file), message=f"Invalid project count '{count_line}' at line 0") from e
+    return names, body_start
+
+@timing.span("read_loose_project")
+def read_loose_project(project_name: str, is_creature: bool, newline: bytes) -> project.AnimdataProject:
+    # build the singlefile blocks of an unpacked project from its loose files
+    cfg = config.get_global('config')
+
+    proj_animdata = cfg.skyrim / "meshes" / "animationdata" / f"{project_name}.txt"
+    proj_boundanims = cfg.skyrim / "meshes" / "animationdata" / "boundanims" / f"anims_{project_name}.txt"
+    proj_animsetdata = cfg.skyrim / "meshes" / "animationsetdata" / f"{project_name}data" / f"{project_name}.txt"
+
+    # check again to make sure the files exist
+    if not proj_animdata.exists():
+        raise FileNotFoundError(f"Missing animation data for {project_name}")
+
+    boundanims = None
+    animset = None
+
+    try:
+        lines_animdata, content = util.count_lines_and_strip(proj_animdata, newline)
+
+        # +1 required for creatures, the blank line that closes the animdata block
+        anims = b"%d" % (lines_animdata + 1 if is_creature else lines_animdata) + newline
+        if lines_animdata:
+            anims += content + newline
+
+        if is_creature:
+            anims += newline
+            lines_boundanims, content = util.count_lines_and_strip(proj_boundanims, newline)
+            boundanims = b"%d" % (lines_boundanims + 1) + newline # +1 required here as well
+            if lines_boundanims:
+                boundanims += content + newline
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(proj_animdata), message=f"Error reading animation data for {project_name}: {e}") from e
+
+    if is_creature:
+        try:
+            # convert creatureprojectdata txt to list
+            expected_file_count, content = util.count_lines_and_strip(proj_animsetdata)
+            files_animsetdata = [entry.strip() for entry in content.decode("utf-8").split("\n")] if expected_file_count else []
+        except (IOError, ValueError) as e:
+            raise errors.ReadError(path=str(proj_animsetdata), message=f"Error reading animsetdata for {project_name}: {e}") from e
+
+        # file count, the file names, then the contents of each file
+        parts = [b"%d" % expected_file_count + newline]
+        parts.extend(entry.encode("utf-8") + newline for entry in files_animsetdata)
+
+        for entry in files_animsetdata:
+            entry_file = Path(cfg.skyrim / "meshes" / "animationsetdata" / f"{project_name}data" / entry)  # verify path exists
+
+            if not entry_file.exists():
+                raise FileNotFoundError(f"Missing animsetdata entry file for {project_name}: {entry_file}")
+
+            try:
+                entry_lines, content = util.count_lines_and_strip(entry_file, newline)
+                if entry_lines:
+                    parts.append(content + newline)
+            except (OSError, PermissionError) as e:
+                raise errors.ReadError(path=str(entry_file), message=f"Error reading animsetdata for {project_name}: {e}") from e
+
+        animset = b"".join(parts)
+
+    return project.AnimdataProject(proj_animdata, project_name, is_creature, 0, 0, anims, boundanims, animset)
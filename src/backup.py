@@ -0,0 +1,277 @@
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import lz4.frame
+
+import errors, reader, timing
+
+# bump this whenever the layout of a snapshot manifest changes
+BACKUP_VERSION = 1
+
+# used when we don't have project offsets for a file
+FALLBACK_CHUNK_SIZE = 1 << 20
+
+# how much of a compressed chunk is read at a time when restoring
+READ_SIZE = 1 << 20
+
+# a store holds snapshots/<id>.json manifests and packs/<id>.pack files. a pack is the LZ4
+# frames of the chunks its snapshot added, one frame per chunk, and every manifest maps each
+# chunk it uses to [pack id, offset, length] in "locations", wherever that chunk was first stored.
+packs_dir = Path("packs")
+snapshots_dir = Path("snapshots")
+
+def chunk_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def pack_path(store: Path, pack_id: str) -> Path:
+    return store / packs_dir / f"{pack_id}.pack"
+
+def block_boundaries(size: int, offsets: list[int] | None) -> list[int]:
+    # one chunk for the header, then one per project block. an append only
+    # touches the header and adds new blocks, everything else is already stored.
+    if offsets:
+        cuts = [0] + sorted(offset for offset in offsets if 0 < offset < size) + [size]
+    else:
+        cuts = list(range(0, size, FALLBACK_CHUNK_SIZE)) + [size]
+    return [cut for i, cut in enumerate(cuts) if i == 0 or cut != cuts[i - 1]]
+
+def new_snapshot_id(store: Path) -> str:
+    snapshot_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # two backups in the same second get a suffix
+    candidate = snapshot_id
+    suffix = 1
+    while (store / snapshots_dir / f"{candidate}.json").exists():
+        candidate = f"{snapshot_id}_{suffix}"
+        suffix += 1
+    return candidate
+
+@timing.span("save_snapshot")
+def save_snapshot(store: Path, files: dict[str, Path], offsets: dict[str, list[int] | None]) -> dict:
+    # files maps the name in the snapshot to the file on disk,
+    # offsets maps the same names to the byte offsets of their project blocks
+    snapshot = {"version": BACKUP_VERSION,
+                "id": new_snapshot_id(store),
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "files": {},
+                "locations": {}}
+
+    # where every chunk we already have is stored, digest -> [pack id, offset, length]
+    known = {}
+    for old_snapshot in list_snapshots(store):
+        known.update(old_snapshot["locations"])
+
+    locations = snapshot["locations"]
+    stored_bytes = 0
+    total_bytes = 0
+
+    # the chunks this snapshot adds go into one pack, one LZ4 frame each. a file
+    # per chunk would waste most of a disk cluster on every project.
+    pack_file = pack_path(store, snapshot["id"])
+    tmp_pack = pack_file.with_name(pack_file.name + ".tmp")
+
+    try:
+        os.makedirs(pack_file.parent, exist_ok=True)
+        with open(tmp_pack, "wb") as pack:
+            for name, file in files.items():
+                hasher = hashlib.blake2b(digest_size=16)
+                digests = []
+
+                with reader.SinglefileReader(file) as readable:
+                    cuts = block_boundaries(readable.size, offsets.get(name))
+                    for start, end in zip(cuts, cuts[1:]):
+                        data = readable.slice(start, end)
+                        hasher.update(data)
+                        digest = chunk_hash(data)
+                        digests.append(digest)
+
+                        if digest in locations:
+                            continue
+                        if digest in known:
+                            locations[digest] = known[digest]
+                            continue
+
+                        # the text compresses very well, and the frame checksum catches a damaged chunk on restore
+                        compressed = lz4.frame.compress(data, content_checksum=True)
+                        locations[digest] = [snapshot["id"], pack.tell(), len(compressed)]
+                        pack.write(compressed)
+                        stored_bytes += len(compressed)
+                        timing.count("bytes written", len(compressed))
+
+                    size = readable.size
+
+                total_bytes += size
+                snapshot["files"][name] = {"size": size, "hash": hasher.hexdigest(), "chunks": digests}
+
+        if stored_bytes:
+            os.replace(tmp_pack, pack_file)
+        else:
+            os.remove(tmp_pack)
+    except OSError as e:
+        raise errors.WriteError(path=str(store), message=f"Could not back up cache files: {e}") from e
+
+    # the manifest goes last, a snapshot only exists once all of its chunks do
+    manifest_path = store / snapshots_dir / f"{snapshot['id']}.json"
+    tmpfile = manifest_path.with_name(manifest_path.name + ".tmp")
+    try:
+        os.makedirs(manifest_path.parent, exist_ok=True)
+        with open(tmpfile, "w", encoding="utf-8") as writable:
+            writable.write(json.dumps(snapshot, separators=(",", ":")))
+        os.replace(tmpfile, manifest_path)
+    except OSError as e:
+        raise errors.WriteError(path=str(manifest_path), message=f"Could not save backup snapshot: {e}") from e
+
+    logging.info(f"Saved backup {snapshot['id']}: stored {stored_bytes} new bytes (compressed) for {total_bytes} bytes of cache.")
+    return snapshot
+
+def copy_chunk(store: Path, digest: str, location: list, packs: dict, writable, file_hasher):
+    # decompress a chunk straight into writable, a piece at a time, and check it on the way.
+    # packs holds the pack files opened so far, so a restore opens each one once.
+    hasher = hashlib.blake2b(digest_size=16)
+    pack_id, offset, length = location
+    path = pack_path(store, pack_id)
+
+    try:
+        if pack_id not in packs:
+            packs[pack_id] = open(path, "rb")
+        readable = packs[pack_id]
+        readable.seek(offset)
+
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        remaining = length
+        while remaining > 0:
+            compressed = readable.read(min(READ_SIZE, remaining))
+            if not compressed:
+                break
+            remaining -= len(compressed)
+            timing.count("bytes read", len(compressed))
+            piece = decompressor.decompress(compressed)
+            hasher.update(piece)
+            file_hasher.update(piece)
+            writable.write(piece)
+
+        if not decompressor.eof:
+            raise errors.CacheError(path=str(path), message=f"Backup chunk {digest} is truncated.")
+    except OSError as e:
+        raise errors.ReadError(path=str(path), message=f"Backup chunk {digest} is missing or unreadable: {e}") from e
+    except RuntimeError as e:
+        # lz4 reports a bad frame or a failed checksum this way
+        raise errors.CacheError(path=str(path), message=f"Backup chunk {digest} is corrupted: {e}") from e
+
+    if hasher.hexdigest() != digest:
+        raise errors.CacheError(path=str(path), message=f"Backup chunk {digest} is corrupted.")
+
+def list_snapshots(store: Path) -> list[dict]:
+    # oldest first
+    snapshots = []
+    folder = store / snapshots_dir
+    if not folder.is_dir():
+        return snapshots
+
+    for manifest_path in sorted(folder.glob("*.json")):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as readable:
+                snapshot = json.load(readable)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable backup snapshot {manifest_path}: {e}")
+            continue
+        if snapshot.get("version") != BACKUP_VERSION:
+            logging.warning(f"Ignoring backup snapshot {manifest_path} from another version.")
+            continue
+        snapshots.append(snapshot)
+
+    # not by file name, "..._HHMMSS_10" would come before "..._HHMMSS_2"
+    snapshots.sort(key=lambda snapshot: snapshot_order(snapshot["id"]))
+    return snapshots
+
+def snapshot_order(snapshot_id: str) -> tuple[str, int]:
+    # the time the id was made from, then the suffix it got to tell same-second backups apart
+    parts = snapshot_id.split("_")
+    suffix = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
+    return "_".join(parts[:2]), suffix
+
+def find_snapshot(store: Path, snapshot_id: str = None) -> dict | None:
+    # the newest one if no id is given
+    snapshots = list_snapshots(store)
+    if not snapshots:
+        return None
+    if snapshot_id is None:
+        return snapshots[-1]
+    for snapshot in snapshots:
+        if snapshot["id"] == snapshot_id:
+            return snapshot
+    return None
+
+@timing.span("restore_snapshot")
+def restore_snapshot(store: Path, snapshot: dict, dst_folder: Path) -> dict[str, Path]:
+    # rebuild every file of the snapshot in dst_folder and check it against the saved hash
+    restored = {}
+    locations = snapshot["locations"]
+    packs = {}
+    os.makedirs(dst_folder, exist_ok=True)
+
+    try:
+        for name, entry in snapshot["files"].items():
+            dst = dst_folder / name
+            hasher = hashlib.blake2b(digest_size=16)
+            try:
+                with open(dst, "wb") as writable:
+                    for digest in entry["chunks"]:
+                        if digest not in locations:
+                            raise errors.CacheError(path=str(store), message=f"Backup {snapshot['id']} doesn't say where chunk {digest} is stored.")
+                        copy_chunk(store, digest, locations[digest], packs, writable, hasher)
+            except OSError as e:
+                raise errors.WriteError(path=str(dst), message=f"Could not rebuild {name} from backup: {e}") from e
+
+            if hasher.hexdigest() != entry["hash"]:
+                raise errors.CacheError(path=str(dst), message=f"{name} from backup {snapshot['id']} doesn't match its checksum.")
+            timing.count("bytes written", entry["size"])
+            restored[name] = dst
+    finally:
+        for pack in packs.values():
+            pack.close()
+
+    return restored
+
+@timing.span("prune_snapshots")
+def prune_snapshots(store: Path, keep: int = None, max_age_days: float = None) -> int:
+    # drop snapshots past the newest `keep` or older than max_age_days, then every pack
+    # nothing uses anymore. a pack stays as long as any of its chunks is used.
+    snapshots = list_snapshots(store)
+    remove = set()
+
+    if keep is not None and len(snapshots) > keep:
+        remove.update(snapshot["id"] for snapshot in snapshots[:len(snapshots) - keep])
+
+    if max_age_days is not None:
+        cutoff = datetime.now() - timedelta(days=max_age_days)
+        remove.update(snapshot["id"] for snapshot in snapshots if datetime.fromisoformat(snapshot["created"]) < cutoff)
+
+    used_packs = set()
+    for snapshot in snapshots:
+        if snapshot["id"] in remove:
+            continue
+        locations = snapshot["locations"]
+        for entry in snapshot["files"].values():
+            for digest in entry["chunks"]:
+                used_packs.add(locations[digest][0])
+
+    freed = 0
+    try:
+        for snapshot_id in remove:
+            os.remove(store / snapshots_dir / f"{snapshot_id}.json")
+
+        # leftover temp files carry an extra extension and never match
+        for path in (store / packs_dir).glob("*"):
+            if path.name.removesuffix(".pack") not in used_packs:
+                freed += path.stat().st_size
+                os.remove(path)
+    except OSError as e:
+        raise errors.WriteError(path=str(store), message=f"Could not prune backups: {e}") from e
+
+    logging.info(f"Removed {len(remove)} backups and freed {freed} bytes.")
+    return len(remove)
@@ -1,11 +1,12 @@
 from datetime import datetime
+import json
 import os
 from pathlib import Path
 from tkinter import filedialog
 import logging
 import shutil
 
-import config, errors, system, util
+import CRC32, config, errors, index, system, util
 
 def sanitize_cache():
 
@@ -25,7 +26,7 @@ def sanitize_cache():
 
     # prompt the user to navigate to the Skyrim SE directory if configured path
     # does not exist. (Fix previous double-negative logic.)
-    if not cfg.skyrim.exists() or not util.check_valid_directory(cfg.skyrim):
+    if not cfg.skyrim.exists() or not util.check_valid_directory(cfg.skyrim, cfg.cache):
         cfg.setup_config()
 
     try:      
@@ -37,7 +38,7 @@ def sanitize_cache():
 def is_in_cache(project_name: str):
     ud = config.get_global('update')
     
-    if project_name.casefold() in ud.cached_projects:
+    if ud.animdata_list is not None and project_name in ud.animdata_list:
         return True
     return False
 
@@ -62,17 +63,11 @@ def is_unpacked(project_name: str):
     return [has_animdata, has_boundanims, has_animsetdata]
 
 def is_creature(project_name: str):
-    cfg = config.get_global('config')
     ud = config.get_global('update')
 
-    animdata_list = ud.animdata_list
-
-    creaturelist = []
-    for entry in animdata_list:
-        if entry['project_type'] == "creature":
-            creaturelist.append(entry['project_name'])
-
-    if project_name in creaturelist:
+    # names are stored lowercase, keep the old case-sensitive match
+    row = ud.animdata_list.get(project_name)
+    if row is not None and row.project_name == project_name and row.is_creature:
         return True
     return False
 
@@ -108,19 +103,65 @@ def restore_vanilla_cache():
     yes_im_sure = config.get_global('yesimsure')
 
     if not yes_im_sure:
-        if util.prompt_yes_no("This will overwrite your current animation cache with the vanilla cache. Continue?",
-                              message_y="Restoring vanilla cache.",
-                              message_n="Cancelling operation.") or yes_im_sure:
-            util.unpack_vanilla_cache(cfg.skyrim)
-    else:
-        util.unpack_vanilla_cache(cfg.skyrim)
+        if not util.prompt_yes_no("This will overwrite your current animation cache with the vanilla cache. Continue?",
+                                  message_y="Restoring vanilla cache.",
+                                  message_n="Cancelling operation."):
+            return
+
+    install_vanilla_cache()
 
     if ud.update_cache() != 0:
         raise errors.CacheError(message="Failed to update after restoring vanilla cache.")
 
+    # keep the index of the vanilla files with them, the next restore doesn't have to parse them.
+    # load_index checks it against the files, so a stale copy only costs a parse.
+    if (cfg.cache / index.index_file).exists():
+        try:
+            shutil.copy2(cfg.cache / index.index_file, cfg.cache / util.vanilla_dir / index.index_file)
+        except OSError as e:
+            logging.debug(f"Could not keep the vanilla index: {e}")
+
+    # the first restore also indexes the vanilla blocks, from then on updates only parse what mods added
+    if not (cfg.cache / util.vanilla_dir / index.baseline_file).exists():
+        try:
+            build_vanilla_index()
+        except errors.SkycatError as e:
+            # only an accelerator, the restore itself worked
+            logging.warning(f"Could not build the vanilla index: {e}")
+
     logging.info("Vanilla cache restored.")
     return
 
+def install_vanilla_cache():
+    cfg = config.get_global('config')
+
+    # the BSA is only opened when it changed since the last restore
+    folder = util.unpack_vanilla_cache(cfg.skyrim, cfg.cache)
+
+    # copy next to Data and swap the files in, the current cache stays if anything fails
+    staging = system.temp_folder() / "vanilla"
+    try:
+        os.makedirs(staging, exist_ok=True)
+        os.makedirs(cfg.skyrim / "meshes", exist_ok=True)
+        pairs = []
+        for name in (config.animdata, config.animsetdata):
+            util.copy_file(folder / "meshes" / name, staging / name)
+            pairs.append((staging / name, cfg.skyrim / "meshes" / name))
+        system.replace_files(pairs)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(staging), message=f"Could not restore vanilla cache: {e}") from e
+    finally:
+        system.clean_temp()
+
+    # the saved index of the vanilla files matches them by content, so update_cache can skip parsing
+    vanilla_index = folder / index.index_file
+    if vanilla_index.exists():
+        try:
+            shutil.copy2(vanilla_index, cfg.cache / index.index_file)
+        except OSError as e:
+            logging.debug(f"Could not reuse the vanilla index: {e}")
+    return 0
+
 def get_creature_projects(list_projects: list[str]):
     cfg = config.get_global('config')
     project_dict = {}
@@ -173,6 +214,47 @@ def dump_cache():
     logging.info("Dumped animdata and animsetdata to JSON.")
     return 0
 
+def build_vanilla_index(dst: Path = None):
+    # write the vanilla baseline next to the pristine vanilla copy in the cache folder, so it's
+    # thrown away with that copy when the BSA changes. the copy is parsed if it's there, the
+    # current cache can only be used if it's untouched vanilla.
+    cfg = config.get_global('config')
+    ud = config.get_global('update')
+
+    vanilla_folder = cfg.cache / util.vanilla_dir
+    meshes_folder = vanilla_folder / "meshes"
+
+    if (meshes_folder / config.animdata).exists() and (meshes_folder / config.animsetdata).exists():
+        animdata_list = ud.read_animdata(meshes_folder / config.animdata)
+        creature_projects = [entry.project_name for entry in animdata_list if entry.is_creature]
+        animsetdata_list = ud.read_animsetdata(meshes_folder / config.animsetdata, creature_projects)
+    else:
+        meshes_folder = cfg.skyrim / "meshes"
+        if ud.animdata_list is None or ud.animsetdata_list is None:
+            raise errors.CacheError(path=str(meshes_folder), message="Update the cache before building the vanilla index.")
+        if ud.new_projects:
+            raise errors.CacheError(path=str(meshes_folder), message=f"The animation cache has {len(ud.new_projects)} non-vanilla projects, the vanilla index has to be built from an untouched cache.")
+        animdata_list = ud.animdata_list
+        animsetdata_list = ud.animsetdata_list
+
+    baseline = index.build_baseline(meshes_folder / config.animdata, meshes_folder / config.animsetdata,
+                                    animdata_list, animsetdata_list)
+
+    if dst is None:
+        dst = vanilla_folder / index.baseline_file
+    tmpfile = dst.with_name(dst.name + ".tmp")
+    try:
+        os.makedirs(dst.parent, exist_ok=True)
+        with open(tmpfile, "w", encoding="utf-8") as writable:
+            writable.write(json.dumps(baseline, separators=(",", ":")))
+        os.replace(tmpfile, dst)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(dst), message=f"Could not write vanilla index: {e}") from e
+
+    ud.baseline = baseline
+    logging.info(f"Wrote the vanilla index for {len(animdata_list)} projects to {dst}.")
+    return 0
+
 def copy_cache(dst_path: Path):
     cfg = config.get_global('config')
     
@@ -188,4 +270,23 @@ def copy_cache(dst_path: Path):
         raise errors.WriteError(path=str(dst_path), message=f"Could not copy cache files: {e}") from e
     logging.info("Copied cache files to temp directory.")
     return 0
-    
\ No newline at end of file
+
+def get_checksums(paths: list[str]):
+    cfg = config.get_global('config')
+
+    # reuse the folder and file name hashes from earlier runs
+    memo_path = cfg.cache / CRC32.memo_file
+    CRC32.crc_cache.load(memo_path)
+
+    for path in paths:
+        folder_crc, file_crc, extension_crc = CRC32.get_checksum(path)
+        print(f"{path}:\n{folder_crc}\n{file_crc}\n{extension_crc}")
+
+    logging.debug(f"CRC cache stats: {CRC32.crc_cache.stats()}")
+    CRC32.crc_cache.save(memo_path)
+    return 0
+
+def get_crc32(string: str):
+    crc = CRC32.CRC32.update(string.encode("utf-8"))
+    print(f"{string}: {crc}")
+    return crc
@@ -30,7 +30,8 @@ class Configurator:
             # Ask the user for the Skyrim SE Data folder. If the dialog is cancelled
             # askdirectory returns an empty string; treat that as a user abort and
             # do not write an empty config file.
-            if util.check_valid_directory(cfgparser.get('PATHS', 'sPathSSE', fallback="")):
+            if util.check_valid_directory(cfgparser.get('PATHS', 'sPathSSE', fallback=""),
+                                          Path(cfgparser.get('PATHS', 'sPathCache', fallback=str(self.cache)))):
                 self.load_config(cfgparser)
                 return 0
         
@@ -40,7 +41,7 @@ class Configurator:
         if not skyrim_path or skyrim_path == "":
             raise errors.UserAbort()
 
-        if not util.check_valid_directory(skyrim_path):
+        if not util.check_valid_directory(skyrim_path, self.cache):
             raise errors.CacheError("Selected directory does not appear to contain a valid animation cache.")
 
         self.set_defaults(skyrim_path, cfgparser)
@@ -64,14 +65,14 @@ class Configurator:
         cfgparser.read(ini_file)
 
         # Safely obtain values with fallbacks to avoid KeyError/NoSectionError.
-        sPathSSE = cfgparser.get('PATHS', 'sPathSSE', fallback=None)
-        if not sPathSSE or not util.check_valid_directory(Path(sPathSSE)):
-            return self.setup_config(cfgparser)
-
         # Read optional paths, falling back to current defaults if missing.
         sPathCache = cfgparser.get('PATHS', 'sPathCache', fallback=str(self.cache))
         sPathBackups = cfgparser.get('PATHS', 'sPathBackups', fallback=str(self.backups))
 
+        sPathSSE = cfgparser.get('PATHS', 'sPathSSE', fallback=None)
+        if not sPathSSE or not util.check_valid_directory(Path(sPathSSE), Path(sPathCache)):
+            return self.setup_config(cfgparser)
+
         self.skyrim = Path(sPathSSE)
         self.cache = Path(sPathCache)
         self.backups = Path(sPathBackups)
@@ -119,7 +120,7 @@ _DRYRUN = False
 _YESIMSURE = False
 
 def set_globals(cfg, ud, dryrun=False, yes_im_sure: bool = False):
-    global _GLOBAL_CONFIG, _GLOBAL_UPDATE, _GLOBAL_LOGGER, _DRYRUN
+    global _GLOBAL_CONFIG, _GLOBAL_UPDATE, _GLOBAL_LOGGER, _DRYRUN, _YESIMSURE
     _GLOBAL_CONFIG = cfg
     _GLOBAL_UPDATE = ud
     _GLOBAL_LOGGER = logging.getLogger(__name__)
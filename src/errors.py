@@ -1,11 +1,18 @@
 # src/errors.py
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, is_dataclass
 
 # Base class for SkyCAT-SE errors
 class SkycatError(Exception):
     def __str__(self) -> str:
         return f"SkyCAT-SE caught an error: {self}"
 
+    # dataclass errors never fill in args, so rebuild them from their fields
+    # when they're sent back from a worker process
+    def __reduce__(self):
+        if is_dataclass(self):
+            return (self.__class__, tuple(getattr(self, field.name) for field in fields(self)))
+        return super().__reduce__()
+
 # Configuration problems (invalid `skycat.ini`).
 @dataclass
 class ConfigError(SkycatError):
@@ -1,327 +1,470 @@
+from concurrent.futures import ProcessPoolExecutor
+import io
 import shutil
 import os
 import logging
 
-import config, cache, errors, system, util
+import config, cache, errors, reader, system, timing, util, writer
 
-def extract_projects(listprojects: list[str]):
+@timing.span("extract_projects")
+def extract_projects(listprojects: list[str], jobs: int = 1):
     cfg = config.get_global('config')
     ud = config.get_global('update')
-    dryrun = config.get_global('dryrun')
     yes_im_sure = config.get_global('yesimsure')
 
     # ensure cache is up to date
     ud.update_cache()
 
+    # with more than one job the whole batch is handed out at once, behind a single prompt
+    if jobs > 1:
+        return extract_stream(listprojects, jobs)
+
     animdata_list = ud.animdata_list
-    animsetdata_list = ud.animsetdata_list
 
     meshes_dir = cfg.skyrim / "meshes"
     v_animdata = config.animdata
     v_animsetdata = config.animsetdata
 
-    for project in listprojects:
-        project = project.lower()
+    animdata_temp_folder, animsetdata_temp_folder = make_temp_folders()
+
+    # map both singlefiles once, every project is read by seeking to its byte offset
+    with timing.span("write_projects"), reader.SinglefileReader(meshes_dir / v_animdata) as animdata_readable, reader.SinglefileReader(meshes_dir / v_animsetdata) as animsetdata_readable, writer.FileSink() as sink:
+
+        for project in listprojects:
+            project = project.lower()
+
+            # check if project exists
+            if not cache.is_in_cache(project.casefold()):
+                logging.warning(f"Project {project} not found. Cancelling...")
+                return 0
+
+            unpacked = cache.is_unpacked(project)
+
+            # check if there are already extracted files in meshes
+            if (any(unpacked)) and not yes_im_sure:
+                if not util.prompt_yes_no(f"Warning: Project {project} already has extracted files. Overwrite?",
+                                                message_y=f"Overwriting existing files for project {project}.",
+                                                message_n=f"Skipping extraction for project {project}."):
+                    # if only one project, exit to main menu
+                    if len(listprojects) == 1:
+                        logging.info("No projects extracted.")
+                        return 0
+                    else:
+                        logging.info(f"Skipping extraction for project {project}.")
+                        continue
+
+            animdata_row = animdata_list.get(project)
+
+            write_animdata(project, animdata_row, animdata_readable, animdata_temp_folder, sink)
+
+            if animdata_row.is_creature:
+                # animsetdata is parsed here the first time, not at all if no creature is extracted
+                animset_row = ud.animsetdata_list.get(project)
+                if animset_row is None:
+                    raise errors.CacheError(path=str(meshes_dir / v_animsetdata), message=f"Could not find animation set data for {project} in local cache.")
+                write_animsetdata(project, animset_row, animsetdata_readable, animsetdata_temp_folder, sink)
+
+            logging.info(f"Successfully extracted {project}.")
 
-        # check if project exists
-        if not cache.is_in_cache(project.casefold()):
-            logging.warning(f"Project {project} not found. Cancelling...")
+    return commit_temp_folders()
+
+def make_temp_folders():
+    cfg = config.get_global('config')
+
+    # check that our animdata directory exists
+    animdata_dir = cfg.skyrim / config.animdata_dir
+
+    try:
+        os.makedirs(animdata_dir, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(animdata_dir), message=f"Could not create animdata directory: {e}") from e
+
+    # create temporary cache folders, on the same drive as Data
+    temp_folder = system.temp_folder()
+    try:
+        animdata_temp_folder = temp_folder / config.animdata_dir
+        animsetdata_temp_folder = temp_folder / config.animsetdata_dir
+        os.makedirs(animdata_temp_folder, exist_ok=True)
+        os.makedirs(animsetdata_temp_folder, exist_ok=True)
+
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(temp_folder), message=f"Could not create temporary cache directories: {e}") from e 
+
+    return animdata_temp_folder, animsetdata_temp_folder
+
+@timing.span("commit")
+def commit_temp_folders():
+    cfg = config.get_global('config')
+    dryrun = config.get_global('dryrun')
+
+    if not dryrun:
+        # move temp files to their final destination, they're already on the same drive
+        system.commit_folder(system.temp_folder(), cfg.skyrim)
+    else:
+        logging.info("Dry run complete. No changes were made.")
+
+    # remove temp folders if they still exist
+    system.clean_temp()
+        
+    return 0
+
+@timing.span("extract_stream")
+def extract_stream(listprojects: list[str], jobs: int = 1):
+    # bulk extraction: walk each singlefile once, top to bottom, and write every
+    # requested project as we pass it. only one project block is held in memory at a time.
+    cfg = config.get_global('config')
+    ud = config.get_global('update')
+    yes_im_sure = config.get_global('yesimsure')
+
+    meshes_dir = cfg.skyrim / "meshes"
+
+    wanted = set(project.lower() for project in listprojects)
+
+    if wanted == set():
+        logging.info("No projects extracted.")
+        return 0
+
+    # ask once for the whole batch instead of once per project
+    if not yes_im_sure and any(any(cache.is_unpacked(project)) for project in wanted):
+        if not util.prompt_yes_no("Warning: Some projects already have extracted files. Overwrite?",
+                                  message_y="Overwriting existing files.",
+                                  message_n="No projects extracted."):
             return 0
 
-        unpacked = cache.is_unpacked(project)
-
-        # check if there are already extracted files in meshes
-        if (any(unpacked)) and not yes_im_sure:
-            if not util.prompt_yes_no(f"Warning: Project {project} already has extracted files. Overwrite?",
-                                            message_y=f"Overwriting existing files for project {project}.",
-                                            message_n=f"Skipping extraction for project {project}."):
-                # if only one project, exit to main menu
-                if len(listprojects) == 1:
-                    logging.info("No projects extracted.")
-                    return 0
-                else:
-                    logging.info(f"Skipping extraction for project {project}.")
-                    continue
-            
-            
-
-        project_index = ud.cached_projects.index(project)
-        animset_index = None
-
-        isCreature = False
-
-        if ud.creature_projects.__contains__(project):
-            isCreature = True
-            animset_index = []
-            for i in range(len(animsetdata_list)):
-                if animsetdata_list[i]["animset_name"] == project:
-                    animset_index = i
-                    break
-
-        ### ANIMATIONDATA ###
-
-        # check that our animdata directory exists
-        animdata_dir = cfg.skyrim / config.animdata_dir
-
-        try:
-            os.makedirs(animdata_dir, exist_ok=True)
-        except (OSError, PermissionError) as e:
-            raise errors.WriteError(path=str(animdata_dir), message=f"Could not create animdata directory: {e}") from e
-
-        # create temporary cache folders
-        try:
-            animdata_temp_folder = cfg.cache / "temp" / config.animdata_dir
-            animsetdata_temp_folder = cfg.cache / "temp" / config.animsetdata_dir
-            os.makedirs(animdata_temp_folder, exist_ok=True)
-            os.makedirs(animsetdata_temp_folder, exist_ok=True)
-
-        except (OSError, PermissionError) as e:
-            raise errors.WriteError(path=str(cfg.cache / "temp"), message=f"Could not create temporary cache directories: {e}") from e 
-
-        # open the animdata file
-        with open(cfg.skyrim / "meshes" / config.animdata, "r", encoding="utf-8") as readable:
-
-            readline = readable.readline
-            strip = str.strip
+    animdata_temp_folder, animsetdata_temp_folder = make_temp_folders()
 
-            try:
-                # record project start line for debug purposes
-                debug_line = int(animdata_list[project_index]["project_start"])
-            except (IndexError, ValueError) as e:
-                raise errors.CacheError(path=str(meshes_dir / v_animdata), message=f"Could not find project start line for {project} in local cache: {e}") from e
+    # the rows are already in file order, so every seek moves forward
+    animdata_rows = [row for row in ud.animdata_list if row.project_name in wanted]
+    # animsetdata is only parsed if a creature was asked for
+    creatures = set(row.project_name for row in animdata_rows if row.is_creature)
+    animset_rows = [row for row in ud.animsetdata_list if row.animset_name in creatures] if creatures else []
 
-            # write the animdata cache file
-            try:
-                with open((animdata_temp_folder / (project + ".txt")), 'w', encoding="utf-8") as animdata_cache:
-
-                    try:
-                        # read lines up to the project start
-                        util.fast_skip(readable, int(animdata_list[project_index]["project_start"]))
-                    except (OSError, PermissionError) as e:
-                        raise errors.ReadError(path=str(meshes_dir / v_animdata), message=f"Could not read animdata file up to project {project} start line {debug_line}: {e}") from e
-                    except (IndexError, ValueError) as e:
-                        raise errors.CacheError(path=str(meshes_dir / v_animdata), message=f"Could not find project start line for {project} in local cache: {e}") from e
-                    # skip line count
-                    util.fast_skip(readable, 1)
-                    debug_line += 1
+    # more workers than cores or projects only adds startup cost
+    jobs = min(jobs, os.cpu_count() or 1, len(animdata_rows))
 
-                    try:
-                        lines_anims = int(animdata_list[project_index]["lines_anims"])
-                    except (IndexError, ValueError) as e:
-                        raise errors.CacheError(path=str(meshes_dir / v_animdata), message=f"Could not find lines_anims for {project} in local cache: {e}") from e
+    if jobs > 1:
+        extract_parallel(animdata_rows, animset_rows, jobs)
+    else:
+        extract_rows(meshes_dir, animdata_rows, animset_rows, animdata_temp_folder, animsetdata_temp_folder)
 
-                    n = 1
-                    
-                    if isCreature:
-                        n = 2
+    extracted = len(animdata_rows)
 
-                    for i in range(lines_anims - n):
-                        animdata_cache.write(readline())
-                        debug_line += 1
+    if extracted != len(wanted):
+        logging.warning(f"{len(wanted) - extracted} requested projects were not found in the cache.")
 
-                    animdata_cache.write(strip(readline()))
-                    debug_line += 1
+    logging.info(f"Successfully extracted {extracted} projects.")
 
-            except ValueError as e:
-                raise errors.ParseError(path=str(meshes_dir / v_animdata), message=f"Invalid lines_anims count at line {debug_line}") from e
-            except (OSError, PermissionError) as e:
-                raise errors.WriteError(path=str(meshes_dir / v_animdata), message=f"Error writing animdata cache for project {project} at line {debug_line}: {e}") from e
+    return commit_temp_folders()
+
+@timing.span("write_projects")
+def extract_rows(meshes_dir, animdata_rows: list, animset_rows: list, animdata_temp_folder, animsetdata_temp_folder):
+    # parsing never waits on the disk, the sink's threads write the files behind us
+    with writer.FileSink() as sink:
+        with reader.SinglefileReader(meshes_dir / config.animdata) as readable:
+            for row in animdata_rows:
+                write_animdata(row.project_name, row, readable, animdata_temp_folder, sink)
 
-            # write the boundanims cache file
-            if isCreature:
+        if not animset_rows:
+            return 0
 
-                boundanims_dir = animdata_temp_folder / "boundanims"
+        with reader.SinglefileReader(meshes_dir / config.animsetdata) as readable:
+            for row in animset_rows:
+                write_animsetdata(row.animset_name, row, readable, animsetdata_temp_folder, sink)
+    return 0
 
-                try:
-                    os.makedirs(boundanims_dir, exist_ok=True)
-                except (OSError, PermissionError) as e:
-                    raise errors.WriteError(path=str(boundanims_dir), message=f"Could not create boundanims directory: {e}") from e
+def split_batches(animdata_rows: list, animset_rows: list, jobs: int) -> list[tuple[list, list]]:
+    # cut the rows into runs of roughly the same number of bytes, keeping file order,
+    # so every worker still reads its own stretch of the singlefiles front to back
+    animset_by_name = {row.animset_name: row for row in animset_rows}
+
+    sizes = []
+    for row in animdata_rows:
+        size = int(row.boundanims_offset_end or row.anims_offset_end) - int(row.anims_offset)
+        animset_row = animset_by_name.get(row.project_name)
+        if animset_row is not None:
+            size += int(animset_row.animset_offset_end) - int(animset_row.animset_offset)
+        sizes.append(size)
+
+    target = sum(sizes) / jobs
+
+    batches = []
+    batch = []
+    batch_size = 0
+    for row, size in zip(animdata_rows, sizes):
+        batch.append(row)
+        batch_size += size
+        if batch_size >= target and len(batches) < jobs - 1:
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+    if batch:
+        batches.append(batch)
+
+    # a creature's animset data goes to the same worker as its animdata
+    return [(batch, [animset_by_name[row.project_name] for row in batch if row.project_name in animset_by_name])
+            for batch in batches]
+
+def init_worker(skyrim, cache_dir):
+    # spawned workers (Windows) don't inherit our globals, give them the paths they need
+    cfg = config.Configurator()
+    cfg.skyrim = skyrim
+    cfg.cache = cache_dir
+    config.set_globals(cfg, None)
+
+def extract_worker(worker_folder, animdata_rows: list, animset_rows: list):
+    cfg = config.get_global('config')
+
+    animdata_temp_folder = worker_folder / config.animdata_dir
+    animsetdata_temp_folder = worker_folder / config.animsetdata_dir
 
-                with open(boundanims_dir / ("anims_" + project + ".txt"), 'w', encoding="utf-8") as boundanims_cache:
-                    try:
+    try:
+        os.makedirs(animdata_temp_folder, exist_ok=True)
+        os.makedirs(animsetdata_temp_folder, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(worker_folder), message=f"Could not create temporary worker directories: {e}") from e
 
-                        # skip whitespace and linecount
-                        util.fast_skip(readable, 2)
-                        debug_line += 2
+    extract_rows(cfg.skyrim / "meshes", animdata_rows, animset_rows, animdata_temp_folder, animsetdata_temp_folder)
+    return len(animdata_rows)
 
-                        try:
-                            lines_boundanims = int(animdata_list[project_index]["lines_boundanims"])
+@timing.span("workers")
+def extract_parallel(animdata_rows: list, animset_rows: list, jobs: int):
+    cfg = config.get_global('config')
+
+    temp_folder = system.temp_folder()
+    jobs_folder = temp_folder / "jobs"
+
+    batches = split_batches(animdata_rows, animset_rows, jobs)
+    logging.info(f"Extracting {len(animdata_rows)} projects with {len(batches)} jobs...")
+
+    # every worker maps the singlefiles itself and writes into its own temp tree
+    with ProcessPoolExecutor(max_workers=len(batches), initializer=init_worker, initargs=(cfg.skyrim, cfg.cache)) as pool:
+        futures = [pool.submit(extract_worker, jobs_folder / str(i), batch_animdata, batch_animset)
+                   for i, (batch_animdata, batch_animset) in enumerate(batches)]
+        for future in futures:
+            future.result()
+
+    return merge_worker_folders(jobs_folder, temp_folder)
+
+def merge_worker_folders(jobs_folder, temp_folder):
+    # each project went to exactly one worker, so the trees never overlap
+    try:
+        for worker_folder in jobs_folder.iterdir():
+            for root, dirs, files in os.walk(worker_folder):
+                target = temp_folder / os.path.relpath(root, worker_folder)
+                os.makedirs(target, exist_ok=True)
+                for name in files:
+                    os.replace(os.path.join(root, name), target / name)
+        shutil.rmtree(jobs_folder)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(jobs_folder), message=f"Could not merge temporary worker directories: {e}") from e
+    return 0
 
-                        except (IndexError, ValueError) as e:
-                            raise errors.CacheError(path=str(meshes_dir / v_animdata), message=f"Could not find lines_boundanims for {project} in local cache: {e}") from e
+def leading_lines(block: bytes, count: int) -> bytes:
+    # keep the first `count` lines of a block and strip the end of the last one,
+    # the same result the old readline loops produced
+    present = block.count(b"\n")
+    if block and not block.endswith(b"\n"):
+        present += 1
 
-                        for i in range(lines_boundanims - 2):
-                            boundanims_cache.write(readline())
-                            debug_line += 1
+    end = len(block)
+    for _ in range(present - count):
+        end = block.rfind(b"\n", 0, end - 1) + 1
 
-                        boundanims_cache.write(strip(readline()))
-                        debug_line += 1
+    return block[:end].rstrip()
+
+def write_animdata(project: str, row: dict, readable, animdata_temp_folder, sink: writer.FileSink):
+    cfg = config.get_global('config')
+    animdata_path = cfg.skyrim / "meshes" / config.animdata
+
+    try:
+        start = int(row.anims_offset)
+        end = int(row.anims_offset_end)
+        lines_anims = int(row.lines_anims)
+    except (KeyError, TypeError, ValueError) as e:
+        raise errors.CacheError(path=str(animdata_path), message=f"Could not find animation data offsets for {project} in local cache: {e}") from e
+
+    try:
+        # jump straight to the project and skip its line count
+        readable.seek(start)
+        readable.readline()
+        block = readable.read(end - readable.tell())
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(animdata_path), message=f"Could not read animdata for project {project} at byte {start}: {e}") from e
+
+    is_creature = row.is_creature
+
+    # creature blocks end with a blank line that doesn't belong to the loose file
+    if is_creature:
+        lines_anims -= 1
+
+    # write the animdata cache file
+    sink.write(animdata_temp_folder / (project + ".txt"), leading_lines(block, lines_anims))
+
+    if not is_creature:
+        return 0
+
+    # write the boundanims cache file
+    boundanims_dir = animdata_temp_folder / "boundanims"
+
+    try:
+        os.makedirs(boundanims_dir, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(boundanims_dir), message=f"Could not create boundanims directory: {e}") from e
+
+    try:
+        start = int(row.boundanims_offset)
+        end = int(row.boundanims_offset_end)
+        lines_boundanims = int(row.lines_boundanims)
+    except (KeyError, TypeError, ValueError) as e:
+        raise errors.CacheError(path=str(animdata_path), message=f"Could not find bound anims offsets for {project} in local cache: {e}") from e
+
+    try:
+        readable.seek(start)
+        readable.readline()
+        block = readable.read(end - readable.tell())
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(animdata_path), message=f"Could not read boundanims for project {project} at byte {start}: {e}") from e
+
+    sink.write(boundanims_dir / ("anims_" + project + ".txt"), leading_lines(block, lines_boundanims - 1))
 
-                    except (OSError, PermissionError) as e:
-                        raise errors.WriteError(path=str(meshes_dir / v_animdata), message=f"Error writing boundanims cache for project {project} at line {debug_line}: {e}") from e
+    return 0
 
-        ### ANIMATIONSETDATA ###
+def write_animsetdata(project: str, row: dict, readable, animsetdata_temp_folder, sink: writer.FileSink):
+    cfg = config.get_global('config')
+    animsetdata_path = cfg.skyrim / "meshes" / config.animsetdata
+
+    try:
+        start = int(row.animset_offset)
+        end = int(row.animset_offset_end)
+        expected_animset_count = int(row.count_animsets)
+    except (KeyError, TypeError, ValueError) as e:
+        raise errors.CacheError(path=str(animsetdata_path), message=f"Could not find animation set data offsets for {project} in local cache: {e}") from e
+
+    try:
+        block = readable.slice(start, end)
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(animsetdata_path), message=f"Could not read animation set data for project {project} at byte {start}: {e}") from e
+
+    # walk the project's block in memory, only the slices get written out
+    buffer = io.BytesIO(block)
+    readline = buffer.readline
+    tell = buffer.tell
+    strip = bytes.strip
+
+    # keep track of the line we're on for error messages
+    debug_line = int(row.animset_start)
+
+    try:
+        # get the expected number of animation sets
+        count_line = readline()
+        animset_count = int(strip(count_line))
+        debug_line += 1
+    except ValueError as e:
+        raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set count at line {debug_line}") from e
+
+    # check to make sure the cache data matches
+    if animset_count != expected_animset_count:
+        logging.debug(f"Expected {expected_animset_count} sets, got {animset_count}.")
+        raise errors.ParseError(path=str(animsetdata_path), message=f"Animation set count mismatch at line {debug_line}")
+
+    newline = b"\r\n" if count_line.endswith(b"\r\n") else b"\n"
+
+    project_dir = animsetdata_temp_folder / str(project + "data")
+
+    # check to make sure the path to project's "projectdata" folder exists
+    try:
+        os.makedirs(project_dir, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(project_dir), message=f"Could not create project animation set directory: {e}") from e
+
+    try:
+        # create the set list file
+        # this file contains a list of all the animation set text files
+        animset_list = []
+        for i in range(animset_count):
+            animset_list.append(strip(readline()).lower().decode("utf-8"))
+            debug_line += 1
+
+        sink.write(project_dir / (project + ".txt"), b"".join(item.encode("utf-8") + newline for item in animset_list))
+
+        for i in range(animset_count):
+            set_start = tell()
+
+            # skip the V3 line
+            readline()
+            debug_line += 1
 
-        if isCreature:
-                
-            # open the animdata file
-            with open(cfg.skyrim / 'meshes' / config.animsetdata, "r", encoding="utf-8") as readable:
+            try:
+                # notes A, single line each
+                notes_A = readline()
+                debug_line += 1
+                notes_A_int = int(strip(notes_A))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set notes count: {notes_A} at line {debug_line}: {e}") from e
 
-                readline = readable.readline
-                strip = str.strip
+            util.fast_skip(buffer, notes_A_int)
+            debug_line += notes_A_int
 
-                try:
-                    debug_line = int(animsetdata_list[animset_index]["animset_start"])
-                except (IndexError, ValueError) as e:
-                    raise errors.CacheError(path=str(meshes_dir / v_animsetdata), message=f"Could not find animation set data start line for {project} in local cache: {e}") from e
+            try:
+                # notes B, sets of 3
+                notes_B = readline()
+                debug_line += 1
+                notes_B_int = int(strip(notes_B))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set notes count: {notes_B} at line {debug_line}: {e}") from e
+
+            util.fast_skip(buffer, notes_B_int * 3)
+            debug_line += notes_B_int * 3
+
+            try:
+                # notes C, two lines, a count, then that many lines
+                notes_C = readline()
+                debug_line += 1
+                notes_C_int = int(strip(notes_C))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set notes count: {notes_C} at line {debug_line}: {e}") from e
+
+            for j in range(notes_C_int):
+                util.fast_skip(buffer, 2)
+                debug_line += 2
 
-                # write the animsetdata cache file
                 try:
-                    try:
-                    # skip to the project start
-                        util.fast_skip(readable, int(animsetdata_list[animset_index]["animset_start"]))  # skip line count
-                    except (IndexError, ValueError) as e:
-                        raise errors.CacheError(path=str(meshes_dir / v_animsetdata), message=f"Could not find animation set data start line for {project} in local cache: {e}") from e
-                
-                    # get the expected number of animation sets
-                    animset_count = int(strip(readline()))
+                    n = readline()
                     debug_line += 1
+                    n_int = int(strip(n))
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set notes count: {n} at line {debug_line}: {e}") from e
 
-                    try:
-                        expected_animset_count = int(animsetdata_list[animset_index]["count_animsets"])
-                    except (IndexError, ValueError) as e:
-                        raise errors.CacheError(path=str(meshes_dir / v_animsetdata), message=f"Could not find animation set data count for {project} in local cache: {e}") from e
-
-                    # check to make sure the cache data matches
-                    if animset_count != expected_animset_count:
-                        logging.debug(f"Expected {expected_animset_count} sets, got {animset_count}.")
-                        raise errors.ParseError(path=str(meshes_dir / v_animsetdata), message=f"Animation set count mismatch at line {debug_line}")
-
-                    project_dir = animsetdata_temp_folder / str(project + "data")
-
-                    # check to make sure the path to project's "projectdata" folder exists
-                    try:
-                        os.makedirs(project_dir, exist_ok=True)
-                    except (OSError, PermissionError) as e:
-                        raise errors.WriteError(path=str(project_dir), message=f"Could not create project animation set directory: {e}") from e
-
-                    # create the set list file
-                    # this file contains a list of all the animation set text files
-                    with open(project_dir / (project + ".txt"), 'w', encoding="utf-8") as animsetlist:
-                        animset_list = []
-
-                        # write the file names to the animsetlist txt
-                        for i in range(animset_count):
-                            animset_list.append(strip(readline()).lower())
-                            debug_line += 1
-
-                        for item in animset_list:
-                            animsetlist.write(item + "\n")
-
-                    for i in range(animset_count):
-                        with open(project_dir / animset_list[i], 'w', encoding="utf-8") as writable:
-
-                            # write the first V3
-                            writable.write(readline())
-                            debug_line += 1
-                        
-                            try:
-                                # write notes A, B, and C
-                                notes_A = readline()
-                                debug_line += 1
-                                notes_A_int = int(strip(notes_A))
-                                writable.write(notes_A)
-                            except ValueError as e:
-                                raise errors.ParseError(path=str(meshes_dir / v_animsetdata), message=f"Invalid animation set notes count: {notes_A} at line {debug_line}: {e}") from e
-
-
-                            if notes_A_int != 0:
-                                for j in range(notes_A_int):
-                                    writable.write(readline())
-                                    debug_line += 1
-
-                            try:
-                                notes_B = readline()
-                                debug_line += 1
-                                notes_B_int = int(strip(notes_B))
-                            except ValueError as e:
-                                raise errors.ParseError(path=str(meshes_dir / v_animsetdata), message=f"Invalid animation set notes count: {notes_B} at line {debug_line}: {e}") from e
-
-                            writable.write(notes_B)
-                            
-                            if notes_B_int != 0:
-                                for j in range(notes_B_int):
-                                    for k in range(3):
-                                        writable.write(readline())
-                                        debug_line += 1
-
-                            try:
-                                notes_C = readline()
-                                debug_line += 1
-                                notes_C_int = int(strip(notes_C))
-                            except ValueError as e:
-                                raise errors.ParseError(path=str(meshes_dir / v_animsetdata), message=f"Invalid animation set notes count: {notes_C} at line {debug_line}: {e}") from e
-
-                            writable.write(notes_C)
-
-                            if notes_C_int != 0:
-                                for j in range(notes_C_int):
-                                    # skip two lines
-                                    for k in range(2):
-                                        writable.write(readline())
-                                        debug_line += 1
-
-                                    n = readline()
-                                    debug_line += 1
-                                    writable.write(n)
-
-                                    # skip 
-                                    for k in range(int(strip(n))):
-                                        writable.write(readline())
-                                        debug_line += 1
-                            
-                            try:
-                                file_count = readline()
-                                debug_line += 1
-                                file_count_int = int(strip(file_count))
-                            except ValueError as e:
-                                raise errors.ParseError(path=str(meshes_dir / v_animsetdata), message=f"Invalid animation set file count: {file_count} at line {debug_line}: {e}") from e
-
-                            writable.write(file_count)
-
-                            for j in range(file_count_int):
-                                # skip two lines
-                                for k in range(2):
-                                    writable.write(readline())
-                                    debug_line += 1
-
-                                # if we are on the last line, strip whitespace.
-                                if i == animset_count - 1 and j == file_count_int - 1:
-                                    writable.write(strip(readline()))
-                                    debug_line += 1
-                                
-                                else:
-                                    writable.write(readline())
-                                    debug_line += 1
-                      
-                except (OSError, PermissionError) as e:
-                    raise errors.WriteError(path=str(meshes_dir / v_animsetdata), message=f"Error writing animsetdata cache for project {project} at line {debug_line}: {e}") from e
-                
-        logging.info(f"Successfully extracted {project}.")
+                util.fast_skip(buffer, n_int)
+                debug_line += n_int
 
-    if not dryrun:
-        # move temp files to their final destination
-        shutil.copytree(cfg.cache / "temp", cfg.skyrim, dirs_exist_ok=True)
-    else:
-        logging.info("Dry run complete. No changes were made.")
+            try:
+                file_count = readline()
+                debug_line += 1
+                file_count_int = int(strip(file_count))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_path), message=f"Invalid animation set file count: {file_count} at line {debug_line}: {e}") from e
+
+            # three lines per animation file
+            util.fast_skip(buffer, file_count_int * 3)
+            debug_line += file_count_int * 3
+
+            animset = block[set_start:tell()]
+
+            # if we are on the last line, strip whitespace.
+            if i == animset_count - 1 and file_count_int != 0:
+                animset = animset.rstrip()
+
+            sink.write(project_dir / animset_list[i], animset)
+
+    except (OSError, PermissionError) as e:
+        raise errors.ReadError(path=str(animsetdata_path), message=f"Error reading animsetdata for project {project} at line {debug_line}: {e}") from e
 
-    # remove temp folders if they still exist
-    system.clean_temp()
-        
     return 0
 
 
-def extract_all(and_i_mean_all_of_them: bool=False):
+@timing.span("extract_all")
+def extract_all(and_i_mean_all_of_them: bool=False, jobs: int = 1):
     cfg = config.get_global('config')
     ud = config.get_global('update')
 
@@ -330,7 +473,6 @@ def extract_all(and_i_mean_all_of_them: bool=False):
 
     vanilla_projects_count = len(ud.vanilla_projects)
     animdata_list = ud.animdata_list
-    animsetdata_list = ud.animsetdata_list
 
     # get count for total projects
     total_projects = len(animdata_list)                  
@@ -339,7 +481,8 @@ def extract_all(and_i_mean_all_of_them: bool=False):
         logging.warning("No modded projects found.")
         return
     
-    extract_everything = False
+    # -yesimsure answers the prompt below with yes
+    extract_everything = and_i_mean_all_of_them and yes_im_sure
     
     if and_i_mean_all_of_them and not yes_im_sure:
         print("This will extract ALL projects, including vanilla ones.")
@@ -365,6 +508,6 @@ def extract_all(and_i_mean_all_of_them: bool=False):
                     raise errors.CacheError(path=str(cfg.cache), message="Failed to update cache before extracting all projects.")
             to_extract = ud.new_projects
 
-    extract_projects(to_extract)
+    extract_stream(to_extract, jobs)
 
     return 0
\ No newline at end of file
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import table, timing
+
+# bump this whenever the layout of the saved rows changes
+INDEX_VERSION = 5
+
+# bump this whenever the layout of the vanilla baseline changes
+BASELINE_VERSION = 1
+
+index_file = Path("index.json")
+# kept in the folder of the pristine vanilla singlefiles, see cache.build_vanilla_index
+baseline_file = Path("baseline.json")
+
+def block_hasher():
+    # for hashing a block piece by piece, gives the same hash as block_hash
+    return hashlib.blake2b(digest_size=16)
+
+def file_hash(hashes: list[str]) -> str:
+    # a singlefile's hash is made from the hashes of its header and its blocks, so a writer
+    # that copied blocks can use their stored hashes instead of reading them again
+    return block_hash("".join(hashes).encode("ascii"))
+
+def content_hash(data: bytes, blocks: dict = None) -> str:
+    # without blocks the whole file counts as its header
+    if not blocks or not blocks["lengths"]:
+        return file_hash([block_hash(data)])
+
+    hashes = [block_hash(data[:blocks["offset"]])]
+    offset = blocks["offset"]
+    for length in blocks["lengths"]:
+        hashes.append(block_hash(data[offset:offset + length]))
+        offset += length
+    return file_hash(hashes)
+
+def fingerprint(file: Path, data: bytes, blocks: dict = None) -> dict:
+    stat = os.stat(file)
+    return {"size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash(data, blocks)}
+
+def matches_fingerprint(file: Path, saved: dict, blocks: dict = None) -> bool:
+    # blocks are the ones saved along with the fingerprint, the hash is made from them
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return False
+
+    # a different size always means a different file
+    if stat.st_size != saved.get("size"):
+        return False
+
+    # same size and same mtime, trust it without reading the file
+    if stat.st_mtime_ns == saved.get("mtime_ns"):
+        return True
+
+    # same size but touched (copied, restored from backup...), compare the contents
+    try:
+        with open(file, "rb") as readable:
+            data = readable.read()
+    except OSError:
+        return False
+    if content_hash(data, blocks) != saved.get("hash"):
+        return False
+
+    saved["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+def read_index(cache_dir: Path, meshes_folder: Path):
+    # the saved index for this meshes folder, whether or not the singlefiles changed since
+    index_path = cache_dir / index_file
+
+    if not index_path.exists():
+        return None
+
+    try:
+        with open(index_path, "r", encoding="utf-8") as readable:
+            saved = json.load(readable)
+    except (OSError, ValueError) as e:
+        logging.debug(f"Ignoring unreadable index {index_path}: {e}")
+        return None
+
+    if saved.get("version") != INDEX_VERSION or saved.get("meshes") != str(meshes_folder):
+        return None
+    return saved
+
+@timing.span("load_index")
+def load_index(cache_dir: Path, meshes_folder: Path, animdata_file: Path, animsetdata_file: Path, saved: dict = None):
+    # returns the saved index if both singlefiles are unchanged, otherwise None.
+    # pass what read_index returned to check it without reading it again.
+    index_path = cache_dir / index_file
+
+    if saved is None:
+        saved = read_index(cache_dir, meshes_folder)
+    if saved is None:
+        return None
+
+    old_mtimes = (saved["animdata"].get("mtime_ns"), saved["animsetdata"].get("mtime_ns"))
+
+    if not matches_fingerprint(animdata_file, saved["animdata"], saved.get("animdata_blocks")):
+        return None
+    if not matches_fingerprint(animsetdata_file, saved["animsetdata"], saved.get("animsetdata_blocks")):
+        return None
+
+    # contents matched but the files were touched, refresh the stored mtimes
+    if old_mtimes != (saved["animdata"]["mtime_ns"], saved["animsetdata"]["mtime_ns"]):
+        write_index(index_path, saved)
+
+    return saved
+
+@timing.span("save_index")
+def save_index(cache_dir: Path, meshes_folder: Path, animdata_file: Path, animsetdata_file: Path,
+               animdata_list: table.ProjectTable, animsetdata_list: table.ProjectTable | None, cached_projects: list, creature_projects: list,
+               written: dict = None):
+    # written maps "animdata" and "animsetdata" to describe_written for a file whose hashes are
+    # known already (e.g. SinglefileWriter just wrote it, or it was saved before), those files
+    # aren't read again. animsetdata_list is None until the animsetdata has been parsed.
+    # returns the index, None if it couldn't be made.
+    written = written or {}
+    try:
+        animdata_fingerprint, animdata_blocks, animdata_columns = describe_file(animdata_file, animdata_list, written.get("animdata"))
+        animsetdata_fingerprint, animsetdata_blocks, animsetdata_columns = describe_file(animsetdata_file, animsetdata_list, written.get("animsetdata"))
+    except OSError as e:
+        logging.warning(f"Could not save project index: {e}")
+        return None
+
+    index = {
+        "version": INDEX_VERSION,
+        "meshes": str(meshes_folder),
+        "animdata": animdata_fingerprint,
+        "animsetdata": animsetdata_fingerprint,
+        "animdata_list": animdata_columns,
+        "animsetdata_list": animsetdata_columns,
+        "animdata_blocks": animdata_blocks,
+        "animsetdata_blocks": animsetdata_blocks,
+        "cached_projects": cached_projects,
+        "creature_projects": creature_projects
+    }
+    write_index(cache_dir / index_file, index)
+    return index
+
+def describe_file(file: Path, rows: table.ProjectTable | None, written: dict = None) -> tuple[dict, dict | None, dict | None]:
+    # the fingerprint of one singlefile, its blocks and its rows as columns, both None without rows.
+    # the block hashes let the next update skip every project that is still the same,
+    # even after something was appended or changed further down.
+    stat = os.stat(file)
+    if written is not None:
+        saved = written["fingerprint"]
+        # a fingerprint from an older index only holds while the file hasn't been touched since
+        if saved["size"] == stat.st_size and saved.get("mtime_ns", stat.st_mtime_ns) == stat.st_mtime_ns:
+            columns = rows.to_columns() if rows is not None else written.get("columns")
+            blocks = written["blocks"] if columns is not None else None
+            return dict(saved, mtime_ns=stat.st_mtime_ns), blocks, columns
+
+    with open(file, "rb") as readable:
+        data = readable.read()
+
+    if rows is None:
+        return fingerprint(file, data), None, None
+    blocks = dict(block_layout(rows, len(data)), hashes=block_hashes(data, rows))
+    return fingerprint(file, data, blocks), blocks, rows.to_columns()
+
+def describe_written(rows: table.ProjectTable, size: int, hashes: list[str]) -> dict:
+    # what save_index needs of a file it doesn't have to read: its size, and the hashes of its
+    # header and of each of the blocks of rows, in order
+    return {"fingerprint": {"size": size, "hash": file_hash(hashes)},
+            "blocks": dict(block_layout(rows, size), hashes=hashes[1:])}
+
+def write_index(index_path: Path, index: dict):
+    # write next to the real file and swap it in, so a crash never leaves half an index
+    tmpfile = index_path.with_name(index_path.name + ".tmp")
+    try:
+        os.makedirs(index_path.parent, exist_ok=True)
+        with open(tmpfile, "w", encoding="utf-8") as writable:
+            # dumps runs the whole thing through the C encoder, dump would go piece by piece
+            writable.write(json.dumps(index, separators=(",", ":")))
+        os.replace(tmpfile, index_path)
+    except OSError as e:
+        # the index is only an accelerator, failing to save it is not fatal
+        logging.warning(f"Could not save project index: {e}")
+    return 0
+
+def block_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def block_layout(rows: table.ProjectTable, size: int) -> dict:
+    # where the blocks of rows sit in a singlefile of this size.
+    # a block runs up to the start of the next one, so the blank line after a creature is part of it.
+    record_type = rows.record_type
+    starts = block_starts(rows)
+    ends = starts[1:] + [size]
+
+    return {"offset": starts[0] if starts else 0,
+            "line": getattr(rows[0], record_type.line_fields[0]) if starts else 0,
+            "lengths": [end - start for start, end in zip(starts, ends)]}
+
+def block_starts(rows: table.ProjectTable) -> list[int]:
+    start_field = rows.record_type.offset_fields[0]
+    return [getattr(row, start_field) for row in rows]
+
+def block_hashes(data: bytes, rows: table.ProjectTable) -> list[str]:
+    starts = block_starts(rows)
+    ends = starts[1:] + [len(data)]
+    return [block_hash(data[start:end]) for start, end in zip(starts, ends)]
+
+def describe_blocks(data: bytes, rows: table.ProjectTable) -> dict:
+    # the rows of one singlefile plus the byte length and hash of every project block in it
+    return dict(block_layout(rows, len(data)), hashes=block_hashes(data, rows), columns=rows.to_columns())
+
+def build_baseline(animdata_file: Path, animsetdata_file: Path,
+                   animdata_list: table.ProjectTable, animsetdata_list: table.ProjectTable) -> dict:
+    with open(animdata_file, "rb") as readable:
+        animdata = readable.read()
+    with open(animsetdata_file, "rb") as readable:
+        animsetdata = readable.read()
+
+    return {"version": BASELINE_VERSION,
+            "animdata": describe_blocks(animdata, animdata_list),
+            "animsetdata": describe_blocks(animsetdata, animsetdata_list)}
+
+def load_baseline(vanilla_folder: Path) -> dict | None:
+    # the index of the vanilla singlefiles, None if it hasn't been built yet
+    baseline_path = vanilla_folder / baseline_file
+    if not baseline_path.exists():
+        return None
+
+    try:
+        with open(baseline_path, "r", encoding="utf-8") as readable:
+            baseline = json.load(readable)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable vanilla index {baseline_path}: {e}")
+        return None
+
+    if baseline.get("version") != BASELINE_VERSION:
+        logging.warning(f"Ignoring vanilla index {baseline_path} from another version.")
+        return None
+    return baseline
+
+@timing.span("match_prefix")
+def match_prefix(readable, record_type, blocks: dict, names: list[str], line: int) -> tuple[table.ProjectTable | None, int]:
+    # skip the leading blocks described by `blocks` that sit unchanged at the reader's position under
+    # the same names. returns their rows, moved to where they are in this file, and the line the
+    # reader is on afterwards. the last block never counts, at the end of a file it is missing the
+    # blank line it gets once something follows it.
+    known_names = blocks["columns"][record_type.key]
+    lengths = blocks["lengths"]
+    hashes = blocks["hashes"]
+    size = readable.size
+    view = readable.slice
+
+    start = readable.tell()
+    offset = start
+    count = 0
+    for i in range(min(len(hashes) - 1, len(names))):
+        end = offset + lengths[i]
+        if end > size or names[i].casefold() != known_names[i].casefold():
+            break
+        if block_hash(view(offset, end)) != hashes[i]:
+            break
+        offset = end
+        count += 1
+
+    if count == 0:
+        return None, line
+
+    readable.seek(offset)
+    columns = {field: values[:count] for field, values in blocks["columns"].items()}
+    rows = table.ProjectTable.from_columns(record_type, columns).shifted(start - blocks["offset"], line - blocks["line"])
+    return rows, line + blocks["columns"][record_type.line_fields[0]][count] - blocks["line"]
@@ -0,0 +1,178 @@
+from datetime import datetime
+import io
+import json
+import logging
+import os
+from pathlib import Path
+
+import sse_bsa
+
+import config, errors, reader, util
+import CRC32
+
+# bump this whenever the layout of the saved index changes
+LOOKUP_VERSION = 1
+
+lookup_file = Path("crc_lookup.json")
+
+def find_hkx_paths(data_dir: Path) -> list[str]:
+    hkx_paths = []
+
+    # loose files first, they win over the archive
+    meshes_dir = data_dir / "meshes"
+    for root, dirs, files in os.walk(meshes_dir):
+        for name in files:
+            if name.lower().endswith(".hkx"):
+                hkx_paths.append(str(Path(root, name).relative_to(data_dir)))
+
+    archive_path = data_dir / "Skyrim - Animations.bsa"
+    if archive_path.exists():
+        try:
+            anims_archive = sse_bsa.BSAArchive(archive_path)
+            # BSAArchive.files is sse_bsa's listing of every path in the archive (1.1.0, see requirements.txt)
+            archive_files = anims_archive.files
+        except AttributeError as e:
+            raise errors.ReadError(path=str(archive_path), message=f"This version of sse_bsa can't list archives, install the one in requirements.txt: {e}") from e
+        except (OSError, RuntimeError, ValueError) as e:
+            raise errors.ReadError(path=str(archive_path), message=f"Failed to list animation archive: {e}") from e
+        hkx_paths.extend(str(file) for file in archive_files if str(file).lower().endswith(".hkx"))
+
+    return hkx_paths
+
+def build_lookup(hkx_paths: list[str], memo: CRC32.CRCCache = CRC32.crc_cache) -> dict:
+    folders = []
+    stems = []
+    for path in hkx_paths:
+        folder, stem, extension = CRC32.split_hkx_path(path)
+        folders.append(folder)
+        stems.append(stem)
+
+    # the same few folders repeat for thousands of files, only look each one up once
+    unique_folders = list(dict.fromkeys(folders))
+    folder_crcs = dict(zip(unique_folders, memo.get_many(unique_folders)))
+    stem_crcs = memo.get_many(stems)
+
+    lookup = {"version": LOOKUP_VERSION, "folders": {}, "files": {}}
+
+    for path, folder, stem_crc in zip(hkx_paths, folders, stem_crcs):
+        folder_crc = folder_crcs[folder]
+        lookup["folders"].setdefault(str(folder_crc), folder)
+        # keyed on both CRCs, file names repeat across folders
+        lookup["files"].setdefault(f"{folder_crc},{stem_crc}", path)
+
+    return lookup
+
+def load_lookup(rebuild: bool = False) -> dict:
+    cfg = config.get_global('config')
+    lookup_path = cfg.cache / lookup_file
+
+    if not rebuild and lookup_path.exists():
+        try:
+            with open(lookup_path, "r", encoding="utf-8") as readable:
+                lookup = json.load(readable)
+            if lookup.get("version") == LOOKUP_VERSION:
+                return lookup
+        except (OSError, ValueError) as e:
+            logging.debug(f"Ignoring unreadable CRC lookup {lookup_path}: {e}")
+
+    logging.info("Building CRC lookup from meshes and the animation archive...")
+    hkx_paths = find_hkx_paths(cfg.skyrim)
+
+    # reuse the folder and file name hashes from earlier runs, and keep the new ones for the next
+    memo_path = cfg.cache / CRC32.memo_file
+    CRC32.crc_cache.load(memo_path)
+    lookup = build_lookup(hkx_paths)
+    logging.debug(f"CRC cache stats: {CRC32.crc_cache.stats()}")
+    CRC32.crc_cache.save(memo_path)
+    logging.info(f"Indexed {len(lookup['files'])} animations in {len(lookup['folders'])} folders.")
+
+    tmpfile = Path(str(lookup_path) + ".tmp")
+    try:
+        os.makedirs(cfg.cache, exist_ok=True)
+        with open(tmpfile, "w", encoding="utf-8") as writable:
+            json.dump(lookup, writable, separators=(",", ":"))
+        os.replace(tmpfile, lookup_path)
+    except OSError as e:
+        logging.warning(f"Could not save CRC lookup: {e}")
+
+    return lookup
+
+def resolve(lookup: dict, folder_crc: int, file_crc: int):
+    # O(1), returns None if the animation isn't in the lookup
+    return lookup["files"].get(f"{folder_crc},{file_crc}")
+
+def iter_animset_triplets(block: bytes):
+    # yields (set name, [(folder crc, file crc, extension crc), ...]) for one project's animsetdata block
+    buffer = io.BytesIO(block)
+    readline = buffer.readline
+    strip = bytes.strip
+
+    set_count = int(strip(readline()))
+    set_names = [strip(readline()).decode("utf-8") for _ in range(set_count)]
+
+    for set_name in set_names:
+        # V3
+        readline()
+
+        notes_A = int(strip(readline()))
+        util.fast_skip(buffer, notes_A)
+
+        notes_B = int(strip(readline()))
+        util.fast_skip(buffer, notes_B * 3)
+
+        notes_C = int(strip(readline()))
+        for _ in range(notes_C):
+            util.fast_skip(buffer, 2)
+            util.fast_skip(buffer, int(strip(readline())))
+
+        file_count = int(strip(readline()))
+        triplets = []
+        for _ in range(file_count):
+            triplets.append((int(strip(readline())), int(strip(readline())), int(strip(readline()))))
+
+        yield set_name, triplets
+
+def annotate_animsets(listprojects: list[str] = None, rebuild: bool = False):
+    cfg = config.get_global('config')
+    ud = config.get_global('update')
+
+    ud.update_cache()
+    lookup = load_lookup(rebuild)
+
+    wanted = None if not listprojects else set(project.lower() for project in listprojects)
+    animsetdata_path = cfg.skyrim / "meshes" / config.animsetdata
+
+    records = []
+    resolved = 0
+    unresolved = 0
+
+    # one pass over the file, rows are in file order
+    with reader.SinglefileReader(animsetdata_path) as readable:
+        for row in ud.animsetdata_list:
+            project = row.animset_name
+            if wanted is not None and project not in wanted:
+                continue
+
+            block = readable.slice(int(row.animset_offset), int(row.animset_offset_end))
+
+            try:
+                for set_name, triplets in iter_animset_triplets(block):
+                    paths = []
+                    for folder_crc, file_crc, extension_crc in triplets:
+                        path = resolve(lookup, folder_crc, file_crc)
+                        if path is None:
+                            unresolved += 1
+                            # unknown file, but we might still know the folder
+                            folder = lookup["folders"].get(str(folder_crc), f"<unknown {folder_crc}>")
+                            path = f"{folder}\\<unknown {file_crc}>"
+                        else:
+                            resolved += 1
+                        paths.append(path)
+                    records.append({"project": project, "animset": set_name, "paths": paths})
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_path), message=f"Unexpected value in animation set data for {project}: {e}") from e
+
+    dump_path = cfg.cache / "dump" / f"animset_paths_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    util.dump_json(records, cfg.cache, dump_path)
+    logging.info(f"Resolved {resolved} of {resolved + unresolved} animation paths. Saved to {dump_path}.")
+    return 0
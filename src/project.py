@@ -0,0 +1,230 @@
+import contextlib
+from pathlib import Path
+
+import errors, reader
+
+class Clip:
+    # one clip generator in a project's anim data
+    __slots__ = ("name", # clip generator name
+                 "clip_id", # id the motion data refers to
+                 "speed", # playback speed
+                 "crop_start", # crop start offset
+                 "crop_end", # crop end offset
+                 "triggers") # "event:time" lines
+
+    def __init__(self, name: str, clip_id: str, speed: str, crop_start: str, crop_end: str, triggers: list[str]):
+        self.name = name
+        self.clip_id = clip_id
+        self.speed = speed
+        self.crop_start = crop_start
+        self.crop_end = crop_end
+        self.triggers = triggers
+
+class Motion:
+    # root motion of one clip, from a creature's bound anims
+    __slots__ = ("clip_id", # clip this motion belongs to
+                 "duration", # clip duration
+                 "translations", # "time x y z" lines
+                 "rotations") # "time x y z w" lines
+
+    def __init__(self, clip_id: str, duration: str, translations: list[str], rotations: list[str]):
+        self.clip_id = clip_id
+        self.duration = duration
+        self.translations = translations
+        self.rotations = rotations
+
+class AnimdataProject:
+    # One project block of animationdatasinglefile.txt. Holds the raw bytes of the
+    # block and only splits them into hkx files, clips and motion when asked.
+    __slots__ = ("path", # singlefile the block came from, for errors
+                 "project_name", # name of project
+                 "is_creature", # whether the block is followed by bound anims
+                 "line", # line number the block starts on
+                 "offset", # byte offset the block starts at
+                 "anims", # raw anim data, from the line count to the end of the block
+                 "boundanims", # raw bound anims, None for noncreatures
+                 "animset", # raw animsetdata block, if it was read along with the project
+                 "parsed_hkx",
+                 "parsed_clips",
+                 "parsed_motion")
+
+    def __init__(self, path: Path, project_name: str, is_creature: bool, line: int, offset: int,
+                 anims: bytes, boundanims: bytes = None, animset: bytes = None):
+        self.path = path
+        self.project_name = project_name
+        self.is_creature = is_creature
+        self.line = line
+        self.offset = offset
+        self.anims = anims
+        self.boundanims = boundanims
+        self.animset = animset
+        self.parsed_hkx = None
+        self.parsed_clips = None
+        self.parsed_motion = None
+
+    @property
+    def hkx_files(self) -> list[str]:
+        if self.parsed_hkx is None:
+            self.parse_anims()
+        return self.parsed_hkx
+
+    @property
+    def clips(self) -> list[Clip]:
+        if self.parsed_clips is None:
+            self.parse_anims()
+        return self.parsed_clips
+
+    @property
+    def motion(self) -> list[Motion]:
+        if self.parsed_motion is None:
+            self.parse_boundanims()
+        return self.parsed_motion
+
+    def parse_anims(self):
+        # line count, "1", hkx count, hkx files, boundanims flag, then one entry per clip:
+        # name, id, speed, crop start, crop end, trigger count, triggers, blank line
+        lines = self.anims.decode("utf-8").splitlines()
+        line = self.line
+
+        try:
+            hkx_count = int(lines[2])
+            hkx_files = lines[3:3 + hkx_count]
+            i = 3 + hkx_count + 1
+
+            clips = []
+            while i < len(lines):
+                if not lines[i].strip():
+                    # blank line between clips, or the one after the last clip
+                    i += 1
+                    continue
+                name, clip_id, speed, crop_start, crop_end, trigger_count = lines[i:i + 6]
+                trigger_count = int(trigger_count)
+                clips.append(Clip(name, clip_id, speed, crop_start, crop_end, lines[i + 6:i + 6 + trigger_count]))
+                i += 6 + trigger_count
+        except (ValueError, IndexError) as e:
+            raise errors.ParseError(path=str(self.path), message=f"Invalid anim data for {self.project_name} after line {line}: {e}") from e
+
+        self.parsed_hkx = hkx_files
+        self.parsed_clips = clips
+        return 0
+
+    def parse_boundanims(self):
+        # line count, then one entry per clip: clip id, duration, translation count,
+        # translations, rotation count, rotations, blank line
+        if self.boundanims is None:
+            self.parsed_motion = []
+            return 0
+
+        lines = self.boundanims.decode("utf-8").splitlines()
+
+        try:
+            motion = []
+            i = 1
+            while i < len(lines):
+                if not lines[i].strip():
+                    i += 1
+                    continue
+                clip_id, duration, translation_count = lines[i:i + 3]
+                translation_count = int(translation_count)
+                translations = lines[i + 3:i + 3 + translation_count]
+                i += 3 + translation_count
+
+                rotation_count = int(lines[i])
+                rotations = lines[i + 1:i + 1 + rotation_count]
+                i += 1 + rotation_count
+
+                motion.append(Motion(clip_id, duration, translations, rotations))
+        except (ValueError, IndexError) as e:
+            raise errors.ParseError(path=str(self.path), message=f"Invalid bound anims for {self.project_name}: {e}") from e
+
+        self.parsed_motion = motion
+        return 0
+
+def iter_animdata(animdata_file: Path, animsetdata_file: Path = None):
+    # yields one AnimdataProject per block, in file order. only the block being
+    # yielded is held in memory, so this works on a cache of any size. with an
+    # animsetdata file, every creature also gets its animsetdata block, read alongside.
+    with reader.SinglefileReader(animdata_file) as readable, \
+         (reader.SinglefileReader(animsetdata_file) if animsetdata_file is not None else contextlib.nullcontext()) as animset_readable:
+        readline = readable.readline
+        tell = readable.tell
+        skip = readable.skip
+        view = readable.slice
+        strip = bytes.strip
+
+        line_count = 0
+        try:
+            total_projects = int(strip(readline()))
+            line_count += 1
+            project_names = [strip(readline()).decode("utf-8").split(".")[0] for _ in range(total_projects)]
+            line_count += total_projects
+        except ValueError as e:
+            raise errors.ParseError(path=str(animdata_file), message=f"Invalid project header at line {line_count}: {e}") from e
+
+        if animset_readable is not None:
+            try:
+                animset_readable.skip(int(strip(animset_readable.readline())))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid project header: {e}") from e
+
+        for project_name in project_names:
+            start = tell()
+            start_line = line_count
+
+            try:
+                expected_lines = int(strip(readline()))
+                skip(1)
+                hkx_count = int(strip(readline()))
+                skip(hkx_count)
+                has_boundanims = int(strip(readline()))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animdata_file), message=f"Invalid anim data for {project_name} at line {start_line}: {e}") from e
+
+            if has_boundanims not in (0, 1):
+                raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims flag {has_boundanims} for {project_name} at line {start_line}")
+
+            # the count doesn't include its own line, we already read 3 + hkx_count of them
+            skip(expected_lines - 3 - hkx_count)
+            line_count += 1 + expected_lines
+            anims = view(start, tell())
+
+            boundanims = None
+            if has_boundanims:
+                boundanims_start = tell()
+                try:
+                    expected_lines = int(strip(readline()))
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims line count for {project_name} at line {line_count}: {e}") from e
+                skip(expected_lines)
+                line_count += 1 + expected_lines
+                boundanims = view(boundanims_start, tell())
+
+            animset = None
+            if has_boundanims and animset_readable is not None:
+                animset = read_animset(animset_readable, animsetdata_file, project_name)
+
+            yield AnimdataProject(animdata_file, project_name, bool(has_boundanims), start_line, start, anims, boundanims, animset)
+
+def read_animset(readable, animsetdata_file: Path, project_name: str) -> bytes:
+    # the next creature block of an animsetdata file: set count, set names, then per set
+    # "V3", notes of one, three and 3 + n lines, and three lines per animation
+    readline = readable.readline
+    skip = readable.skip
+    strip = bytes.strip
+    start = readable.tell()
+
+    try:
+        set_count = int(strip(readline()))
+        skip(set_count)
+        for _ in range(set_count):
+            skip(1)
+            skip(int(strip(readline())))
+            skip(int(strip(readline())) * 3)
+            for _ in range(int(strip(readline()))):
+                skip(2)
+                skip(int(strip(readline())))
+            skip(int(strip(readline())) * 3)
+    except ValueError as e:
+        raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animsetdata for {project_name}: {e}") from e
+
+    return readable.slice(start, readable.tell())
@@ -0,0 +1,89 @@
+import io
+import mmap
+import os
+from pathlib import Path
+
+import errors, timing
+
+# below this many lines, reading them one by one is cheaper than counting a window
+SKIP_LINES_DIRECTLY = 64
+
+class SinglefileReader:
+    # Read-only, memory-mapped view of a singlefile. Works like a binary file
+    # (readline, read, seek, tell), all of them straight from the mapping in C,
+    # and skips long runs of lines by counting newlines instead of reading them.
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.file = None
+        self.buffer = None
+
+        try:
+            self.file = open(self.path, "rb")
+            # mmap refuses empty files, an empty BytesIO behaves the same for our purposes
+            if os.fstat(self.file.fileno()).st_size > 0:
+                self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.buffer = io.BytesIO(b"")
+        except (OSError, ValueError) as e:
+            self.close()
+            raise errors.ReadError(path=str(self.path), message=f"Could not map {self.path}: {e}") from e
+
+        self.size = len(self.buffer) if isinstance(self.buffer, mmap.mmap) else 0
+        # counted whole, a mapping only reads the pages we touch but most commands touch all of them
+        timing.count("bytes read", self.size)
+
+        # running estimate of the average line length, used to size skip windows
+        self.line_length = 16.0
+
+        # bind the mapping's own methods, so hot loops never go through Python
+        self.readline = self.buffer.readline
+        self.read = self.buffer.read
+        self.seek = self.buffer.seek
+        self.tell = self.buffer.tell
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        return 0
+
+    def slice(self, start: int, end: int) -> bytes:
+        # bytes between two offsets, without moving the position
+        return self.buffer[start:end]
+
+    def skip(self, n: int = 1):
+        # move past n lines
+        if n > SKIP_LINES_DIRECTLY and self.size:
+            buffer = self.buffer
+            pos = buffer.tell()
+
+            # count newlines at C speed over a window a bit shorter than we expect n lines to be,
+            # then do it again for whatever is left, until only a few lines are left to read
+            while n > SKIP_LINES_DIRECTLY and pos < self.size:
+                window = int(n * self.line_length * 0.8) + 1
+                newlines = buffer[pos:pos + window].count(b"\n")
+                if newlines >= n:
+                    # lines are shorter than we thought, try again with a smaller window
+                    self.line_length /= 2
+                    continue
+                if newlines:
+                    self.line_length = window / newlines
+                n -= newlines
+                pos += window
+
+            buffer.seek(min(pos, self.size))
+
+        readline = self.readline
+        for _ in range(n):
+            readline()
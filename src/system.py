@@ -3,13 +3,16 @@ import shutil
 from pathlib import Path
 import logging
 
-import config, errors, util
+import backup, config, errors, timing, util
 
+# how many backups prune_backups keeps if it isn't told otherwise
+DEFAULT_KEEP_BACKUPS = 10
+
+@timing.span("save_backup")
 def save_backup(prefix="backup_"):
     cfg = config.get_global('config')
+    ud = config.get_global('update')
 
-    yes_im_sure = config.get_global('yesimsure')
-    
     try:
         os.makedirs(cfg.backups, exist_ok=True)
     except (OSError, PermissionError) as e:
@@ -21,44 +24,46 @@ def save_backup(prefix="backup_"):
     if not animdata_src.exists() or not animsetdata_src.exists():
         raise FileNotFoundError(f"Cannot backup cache, files missing.")
 
-    animdata_dst = cfg.backups / "animationdatasinglefile.txt"
-    animsetdata_dst = cfg.backups / "animationsetdatasinglefile.txt"
-
-    # user consent to overwrite
-    if (animdata_dst.exists() or animsetdata_dst.exists()) and not yes_im_sure:
-        if not util.prompt_yes_no("Existing backup found. Overwrite?",
-                                   message_y="Overwriting existing backup.",
-                                   message_n="Cancelling backup."):
-            return 0
+    # cut the files at the project blocks, so projects that didn't change since
+    # the last backup are shared with it instead of stored again
+    offsets = {}
+    if ud.animdata_list is not None:
+        offsets[str(config.animdata)] = [row.anims_offset for row in ud.animdata_list]
+    # only if the animsetdata is already parsed, parsing it just for this costs more than it saves.
+    # without offsets it's cut into fixed-size chunks.
+    if ud.pending_animsetdata is None and ud.animsetdata_list is not None:
+        offsets[str(config.animsetdata)] = [row.animset_offset for row in ud.animsetdata_list]
 
     logging.info("Creating backup...")
-    copy_backups(animdata_src, animsetdata_src, animdata_dst, animsetdata_dst)
+    backup.save_snapshot(cfg.backups, {str(config.animdata): animdata_src, str(config.animsetdata): animsetdata_src}, offsets)
+    return 0
 
-def load_backup():
+@timing.span("load_backup")
+def load_backup(snapshot_id: str = None):
     cfg = config.get_global('config')
     ud = config.get_global('update')
 
     yes_im_sure = config.get_global('yesimsure')
 
-    backups_path = Path(cfg.backups)
+    snapshot = backup.find_snapshot(cfg.backups, snapshot_id)
 
-    # make sure the backups directory exists and is a folder, and contains files
-    if not backups_path.exists() or not backups_path.is_dir() or not any(backups_path.iterdir()):
-        logging.warning("Warning: No backups found.")
+    # single backups from before snapshots existed
+    legacy_files = [cfg.backups / config.animdata, cfg.backups / config.animsetdata]
+    use_legacy = snapshot is None and snapshot_id is None and all(file.exists() for file in legacy_files)
+
+    if snapshot is None and not use_legacy:
+        if snapshot_id is None:
+            logging.warning("Warning: No backups found.")
+        else:
+            logging.warning(f"Warning: Backup {snapshot_id} not found.")
         return 0
-    
+
     # make sure we have a meshes folder to copy to
     if not (cfg.skyrim / "meshes").exists():
         os.makedirs(cfg.skyrim / "meshes")
 
-    animdata_src = cfg.backups / "animationdatasinglefile.txt"
-    animsetdata_src = cfg.backups / "animationsetdatasinglefile.txt"
-    # make sure the backup files exist
-    if not animdata_src.exists() or not animsetdata_src.exists():
-        raise FileNotFoundError("Backup files missing.")
-
-    animdata_dst = cfg.skyrim / "meshes" / "animationdatasinglefile.txt"
-    animsetdata_dst = cfg.skyrim / "meshes" / "animationsetdatasinglefile.txt"
+    animdata_dst = cfg.skyrim / "meshes" / config.animdata
+    animsetdata_dst = cfg.skyrim / "meshes" / config.animsetdata
 
     # user consent to overwrite
     if (animdata_dst.exists() or animsetdata_dst.exists()) and not yes_im_sure:
@@ -67,75 +72,140 @@ def load_backup():
                                    message_n="Cancelling restore."):
             return 0
 
-    logging.info("Restoring backup...")
-    copy_backups(animdata_src, animsetdata_src, animdata_dst, animsetdata_dst)
-    ud.update_cache()
+    logging.info("Restoring backup..." if use_legacy else f"Restoring backup {snapshot['id']}...")
 
-def copy_backups(animdata_src:Path, animsetdata_src: Path, animdata_dst: Path, animsetdata_dst: Path):
+    # rebuild the files next to Data and swap them in, the old cache stays untouched if anything fails
+    staging = temp_folder() / "restore"
     try:
-        # make sure the destination directories exist
-        os.makedirs(animdata_dst.parent, exist_ok=True)
-        os.makedirs(animsetdata_dst.parent, exist_ok=True)
-
-        # initialize temp variables for backup files
-        old_animdata = None
-        old_animsetdata = None
-
-        # create temporary backups of existing files
-        if animdata_dst.exists():
-            bak_path = Path(str(animdata_dst) + ".bak")
-            old_animdata = Path(shutil.copy2(animdata_dst, bak_path))
-
-        if animsetdata_dst.exists():
-            bak_path = Path(str(animsetdata_dst) + ".bak")
-            old_animsetdata = Path(shutil.copy2(animsetdata_dst, bak_path))
-        
-        try:
-            # copy the cache files to the backup folder
-            shutil.copy2(animdata_src, animdata_dst)
-            shutil.copy2(animsetdata_src, animsetdata_dst)
-        except (OSError, PermissionError):
-            # restore old backups
-            if old_animdata is not None and old_animdata.exists():
-                shutil.move(str(old_animdata), animdata_dst)
-            if old_animsetdata is not None and old_animsetdata.exists():
-                shutil.move(str(old_animsetdata), animsetdata_dst)
-            raise OSError("Failed to backup files. Restoring previous backup.")
-        
-        finally:
-            # clean up any temp files
-                if old_animdata is not None and old_animdata.exists():
-                    os.remove(str(old_animdata))
-                if old_animsetdata is not None and old_animsetdata.exists():
-                    os.remove(str(old_animsetdata))
-
-        logging.info("Backup successful.")
-        return 0
+        if use_legacy:
+            os.makedirs(staging, exist_ok=True)
+            restored = {file.name: Path(shutil.copy2(file, staging / file.name)) for file in legacy_files}
+        else:
+            restored = backup.restore_snapshot(cfg.backups, snapshot, staging)
 
+        replace_files([(restored[name], cfg.skyrim / "meshes" / name) for name in restored])
     except (OSError, PermissionError) as e:
-        # attempt to clean up any partial temp backup files
-        old_animdata = Path(str(animdata_dst) + ".bak")
-        old_animsetdata = Path(str(animsetdata_dst) + ".bak")
+        raise errors.WriteError(path=str(staging), message=f"Could not restore backup: {e}") from e
+    finally:
+        clean_temp()
+
+    logging.info("Backup restored.")
+    ud.update_cache()
+    return 0
 
-        if old_animdata is not None and old_animdata.exists():
-            os.remove(str(old_animdata))
-        if old_animsetdata is not None and old_animsetdata.exists():
-            os.remove(str(old_animsetdata))
+def list_backups():
+    cfg = config.get_global('config')
 
-        raise OSError(f"Failed to create temporary backup: {e}") from e
+    snapshots = backup.list_snapshots(cfg.backups)
+    if not snapshots:
+        logging.info("No backups found.")
+        return 0
+
+    for snapshot in snapshots:
+        size = sum(entry["size"] for entry in snapshot["files"].values())
+        print(f"{snapshot['id']}    {snapshot['created']}    {size} bytes")
+    return 0
+
+@timing.span("prune_backups")
+def prune_backups(keep: int = None, max_age_days: float = None):
+    cfg = config.get_global('config')
+
+    if keep is None and max_age_days is None:
+        keep = DEFAULT_KEEP_BACKUPS
+
+    backup.prune_snapshots(cfg.backups, keep=keep, max_age_days=max_age_days)
+    return 0
+
+# used for staging when the cache folder is on another drive than Data. it sits in meshes,
+# next to the files it replaces, hidden and named .tmp so nothing takes it for game data.
+# a run that crashed before clean_temp leaves it behind, the next start removes it.
+data_temp_folder = Path("meshes") / ".skycat.tmp"
+
+def temp_folder() -> Path:
+    # new files are staged on the same volume as Data, so committing them is a rename
+    # and not a second copy. the cache folder is used when it shares a volume with Data.
+    cfg = config.get_global('config')
+
+    try:
+        os.makedirs(cfg.cache, exist_ok=True)
+        if os.stat(cfg.cache).st_dev == os.stat(cfg.skyrim).st_dev:
+            return cfg.cache / "temp"
+    except OSError as e:
+        logging.debug(f"Could not compare cache and Data volumes: {e}")
+
+    return cfg.skyrim / data_temp_folder
+
+@timing.span("replace_files")
+def replace_files(pairs: list[tuple[Path, Path]]):
+    # swap each (new, target) pair in with os.replace, so every target is always either
+    # the complete old file or the complete new one. the old files are kept as hard links
+    # until every swap went through, and put back if one of them fails.
+    swapped = []
+    try:
+        for new, target in pairs:
+            existed = target.exists()
+            old = None
+            if existed:
+                old = Path(str(new) + ".old")
+                try:
+                    if old.exists():
+                        os.remove(old)
+                    os.link(target, old)
+                except OSError as e:
+                    # no hard links on this drive (FAT, some network shares), this one can't be undone
+                    logging.debug(f"Could not keep {target} for rollback: {e}")
+                    old = None
+            os.replace(new, target)
+            swapped.append((target, existed, old))
+
+    except OSError as e:
+        for target, existed, old in reversed(swapped):
+            try:
+                if old is not None:
+                    os.replace(old, target)
+                elif not existed:
+                    os.remove(target)
+            except OSError as rollback_error:
+                logging.error(f"Could not roll back {target}: {rollback_error}")
+        raise errors.WriteError(path=str(e.filename), message=f"Could not replace files, no changes were kept: {e}") from e
+
+    for target, existed, old in swapped:
+        if old is not None and old.exists():
+            os.remove(old)
+    return 0
+
+@timing.span("commit_folder")
+def commit_folder(source: Path, destination: Path):
+    # move every file under source to the same place under destination
+    pairs = []
+    for root, dirs, files in os.walk(source):
+        target_dir = destination / os.path.relpath(root, source)
+        for name in files:
+            pairs.append((Path(root, name), target_dir / name))
+
+    try:
+        for target_dir in set(target.parent for new, target in pairs):
+            os.makedirs(target_dir, exist_ok=True)
+    except (OSError, PermissionError) as e:
+        raise errors.WriteError(path=str(destination), message=f"Could not create destination directories: {e}") from e
+
+    return replace_files(pairs)
 
-           
 def clean_temp():
     cfg = config.get_global('config')
-    temp_path = cfg.cache / "temp"
-    if temp_path.exists():
-        for root, dirs, files in os.walk(temp_path, topdown=False):
-            for name in files:
-                os.remove(os.path.join(root, name))
-            for name in dirs:
-                os.rmdir(os.path.join(root, name))
-        os.rmdir(str(temp_path))
-    else:
+
+    cleaned = False
+    for temp_path in (cfg.cache / "temp", cfg.skyrim / data_temp_folder):
+        if temp_path.exists():
+            for root, dirs, files in os.walk(temp_path, topdown=False):
+                for name in files:
+                    os.remove(os.path.join(root, name))
+                for name in dirs:
+                    os.rmdir(os.path.join(root, name))
+            os.rmdir(str(temp_path))
+            cleaned = True
+
+    if not cleaned:
         logging.info("No temporary files to clean.")
     return 0
 
@@ -0,0 +1,126 @@
+class AnimdataRecord:
+    # one project in animationdatasinglefile.txt
+    __slots__ = ("project_name", # name of project
+                 "project_type", # whether it's a creature or noncreature project
+                 "project_start", # this is the line right before the project starts
+                 "project_end", # line number where project ends
+                 "lines_anims", # expected number of lines for base anim data
+                 "lines_boundanims", # expected number of lines for bound anim data. 0 if nonexistent.
+                 "anims_offset", # byte offset of the project's line count
+                 "anims_offset_end", # byte offset right after the anim data block
+                 "boundanims_offset", # byte offset of the bound anims line count, if any
+                 "boundanims_offset_end") # byte offset right after the bound anims block
+
+    key = "project_name"
+    line_fields = ("project_start", "project_end")
+    offset_fields = ("anims_offset", "anims_offset_end", "boundanims_offset", "boundanims_offset_end")
+
+    def __init__(self, project_name: str, project_type: str = None, project_start: int = 0, project_end: int = None,
+                 lines_anims: int = 0, lines_boundanims: int = 0, anims_offset: int = None, anims_offset_end: int = None,
+                 boundanims_offset: int = None, boundanims_offset_end: int = None):
+        self.project_name = project_name
+        self.project_type = project_type
+        self.project_start = project_start
+        self.project_end = project_end
+        self.lines_anims = lines_anims
+        self.lines_boundanims = lines_boundanims
+        self.anims_offset = anims_offset
+        self.anims_offset_end = anims_offset_end
+        self.boundanims_offset = boundanims_offset
+        self.boundanims_offset_end = boundanims_offset_end
+
+    @property
+    def is_creature(self) -> bool:
+        return self.project_type == "creature"
+
+class AnimsetRecord:
+    # one creature project in animationsetdatasinglefile.txt
+    __slots__ = ("animset_name", # name of project
+                 "animset_start", # line number where project starts
+                 "animset_end", # line number where project ends
+                 "lines_animsets", # expected number of lines for base animset data
+                 "count_animsets", # expected number of animsets
+                 "animset_offset", # byte offset of the animset count
+                 "animset_offset_end") # byte offset right after the last animset
+
+    key = "animset_name"
+    line_fields = ("animset_start", "animset_end")
+    offset_fields = ("animset_offset", "animset_offset_end")
+
+    def __init__(self, animset_name: str, animset_start: int = 0, animset_end: int = None, lines_animsets: int = 0,
+                 count_animsets: int = 0, animset_offset: int = None, animset_offset_end: int = None):
+        self.animset_name = animset_name
+        self.animset_start = animset_start
+        self.animset_end = animset_end
+        self.lines_animsets = lines_animsets
+        self.count_animsets = count_animsets
+        self.animset_offset = animset_offset
+        self.animset_offset_end = animset_offset_end
+
+class ProjectTable:
+    # records in file order, plus a name -> row dict so every lookup is O(1)
+
+    __slots__ = ("record_type", "rows", "rows_by_name")
+
+    def __init__(self, record_type, rows=()):
+        key = record_type.key
+        self.record_type = record_type
+        self.rows = list(rows)
+        self.rows_by_name = {getattr(row, key).casefold(): i for i, row in enumerate(self.rows)}
+
+    def append(self, row):
+        self.rows_by_name[getattr(row, self.record_type.key).casefold()] = len(self.rows)
+        self.rows.append(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def __contains__(self, name: str):
+        return name.casefold() in self.rows_by_name
+
+    def get(self, name: str):
+        i = self.rows_by_name.get(name.casefold())
+        return None if i is None else self.rows[i]
+
+    def index(self, name: str) -> int:
+        # same contract as list.index
+        try:
+            return self.rows_by_name[name.casefold()]
+        except KeyError:
+            raise ValueError(f"{name} is not in the project table") from None
+
+    def names(self) -> list[str]:
+        key = self.record_type.key
+        return [getattr(row, key) for row in self.rows]
+
+    def to_dict(self, orient: str = "records") -> list[dict]:
+        # same shape pandas gives us, so util.dump_json can take a table directly
+        fields = self.record_type.__slots__
+        return [{field: getattr(row, field) for field in fields} for row in self.rows]
+
+    def shifted(self, offset_delta: int, line_delta: int):
+        # copy of the table for the same blocks, after the header in front of them
+        # grew by offset_delta bytes and line_delta lines
+        record_type = self.record_type
+        columns = self.to_columns()
+
+        for fields, delta in ((record_type.offset_fields, offset_delta), (record_type.line_fields, line_delta)):
+            for field in fields:
+                columns[field] = [value if value is None else value + delta for value in columns[field]]
+
+        return ProjectTable.from_columns(record_type, columns)
+
+    def to_columns(self) -> dict:
+        # one list per field, much smaller on disk than a list of dicts
+        return {field: [getattr(row, field) for row in self.rows] for field in self.record_type.__slots__}
+
+    @classmethod
+    def from_columns(cls, record_type, columns: dict):
+        fields = record_type.__slots__
+        return cls(record_type, (record_type(*values) for values in zip(*(columns[field] for field in fields))))
@@ -0,0 +1,74 @@
+import contextlib
+import cProfile
+from datetime import datetime
+import logging
+import os
+from pathlib import Path
+import time
+
+# Wall time per named span and a few running counters, collected for the whole run and
+# printed by -timings. Spans nest, a span opened inside another one is reported under
+# its parent's name, e.g. "append_projects/update_cache/read_animdata". Worker processes
+# keep their own totals, only the main process is reported.
+
+# span path -> [calls, seconds], in the order the spans were first entered
+spans = {}
+# counter name -> total
+counters = {}
+# names of the spans we're currently in
+stack = []
+
+@contextlib.contextmanager
+def span(name: str):
+    # works as a with block and as a function decorator
+    stack.append(name)
+    path = "/".join(stack)
+    entry = spans.setdefault(path, [0, 0.0])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+        stack.pop()
+
+def count(name: str, amount: int):
+    counters[name] = counters.get(name, 0) + amount
+
+def reset():
+    spans.clear()
+    counters.clear()
+    return 0
+
+def summary() -> str:
+    lines = [f"{'Span':<60} {'Calls':>8} {'Total ms':>12}"]
+    for path, (calls, seconds) in spans.items():
+        # indent children under their parent instead of repeating its name
+        depth = path.count("/")
+        name = "  " * depth + path.rsplit("/", 1)[-1]
+        lines.append(f"{name:<60} {calls:>8} {seconds * 1000:>12.2f}")
+
+    if counters:
+        lines.append("")
+        lines.append(f"{'Counter':<60} {'Total':>21}")
+        for name, total in counters.items():
+            lines.append(f"{name:<60} {total:>21,}")
+    return "\n".join(lines)
+
+@contextlib.contextmanager
+def profiled(folder: Path):
+    # run the block under cProfile and save the stats to folder, for pstats or snakeviz
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        path = Path(folder) / f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pstats"
+        try:
+            os.makedirs(path.parent, exist_ok=True)
+            profiler.dump_stats(path)
+            logging.info(f"Profile saved to {path}.")
+        except OSError as e:
+            # losing the profile shouldn't fail the command it was measuring
+            logging.warning(f"Could not save profile to {path}: {e}")
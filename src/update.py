@@ -1,7 +1,7 @@
 from pathlib import Path
 import logging
 
-import config, cache, errors, util
+import config, errors, index, reader, table, timing, util
 
 class Updater:
     def __init__(self):
@@ -12,23 +12,36 @@ class Updater:
             raise FileNotFoundError("Can't find the vanilla projects list. You may need to reinstall the program.")
 
         # instance-scoped state (avoid shared mutable defaults)
-        self.vanilla_projects = []
+        self.vanilla_projects = set()
         self.cached_projects = []
         self.new_projects = []
         self.creature_projects = []
 
         self.animdata_list = None
-        self.animsetdata_list = None
+        self.animsetdata_table = None
+
+        # animsetdata is only parsed once something asks for it, see animsetdata_list
+        self.pending_animsetdata = None
 
         self.cache_dir = None
 
+        # prebuilt index of the vanilla singlefiles, {} if this build doesn't ship one
+        self.baseline = None
+
+        # the saved index of the files as they were before they changed, while they are read again
+        self.previous = None
+
         self.dryrun = False
     
 
+    @timing.span("update_cache")
     def update_cache(self, meshes_folder: Path = None):
         
         cfg = config.get_global('config')
 
+        # the saved index only tracks the real Data folder, not temp folders used for validation
+        use_index = meshes_folder is None
+
         self.dryrun = config.get_global('dryrun')
         self.yes_im_sure = config.get_global('yesimsure')
 
@@ -45,7 +58,7 @@ class Updater:
         
         # make sure we have our vanilla project list loaded
         vanilla_projects_path = util.resource_path(Path("resources") / "vanilla_projects.txt")
-        if self.vanilla_projects == []:
+        if not self.vanilla_projects:
             with open(vanilla_projects_path, "r", encoding="utf-8") as vanilla_dirlist:
                 try:
                     # get all our vanilla project names
@@ -53,26 +66,171 @@ class Updater:
                         if line == "":
                             break
                         
-                        self.vanilla_projects.append(line.strip().casefold())
+                        self.vanilla_projects.add(line.strip().casefold())
                 except IOError as e:
                     raise errors.ReadError(path=str(vanilla_dirlist), message=f"Failed to read vanilla projects list: {e}") from e
 
-        logging.debug("Updating animdata index...")
+        if self.baseline is None:
+            self.baseline = index.load_baseline(cfg.cache / util.vanilla_dir) or {}
 
         animdata_file = meshes_folder / config.animdata
         animsetdata_file = meshes_folder / config.animsetdata
 
-        util.check_valid_directory(cfg.skyrim)
-        
+        util.check_valid_directory(cfg.skyrim, cfg.cache)
+
+        saved = None
+        if use_index:
+            previous = index.read_index(self.cache_dir, meshes_folder)
+            saved = index.load_index(self.cache_dir, meshes_folder, animdata_file, animsetdata_file, previous)
+            self.previous = previous
+
+        # animsetdata waits until something needs it: (file, creature projects, saved index, whether to save,
+        # the index the animsetdata is added to once it's parsed, None to save the whole index again)
+        pending = None
+        animsetdatalist = None
+
+        if saved is not None:
+            logging.debug("Animation cache unchanged, using saved index.")
+            animdatalist = table.ProjectTable.from_columns(table.AnimdataRecord, saved["animdata_list"])
+            cached_projects = saved["cached_projects"]
+            creature_projects = saved["creature_projects"]
+            self.previous = None
+
+            if saved["animsetdata_list"] is not None:
+                animsetdatalist = table.ProjectTable.from_columns(table.AnimsetRecord, saved["animsetdata_list"])
+            else:
+                pending = (animsetdata_file, creature_projects, saved, True, saved)
+        else:
+            try:
+                logging.debug("Updating animdata index...")
+                animdatalist = self.read_animdata(animdata_file)
+            finally:
+                previous = self.previous
+                self.previous = None
+
+            # saving local variables, will commit to class variables later
+            for entry in animdatalist:
+                cached_projects.append(entry.project_name.casefold())
+                if entry.is_creature:
+                    creature_projects.append(entry.project_name.casefold())
+
+            if self.dryrun:
+                # nothing is kept in a dry run, check the animsetdata now or not at all
+                animsetdatalist = self.read_animsetdata(animsetdata_file, creature_projects)
+            else:
+                # the animsetdata rows are added to the index once they are parsed
+                saved = None
+                if use_index:
+                    saved = index.save_index(self.cache_dir, meshes_folder, animdata_file, animsetdata_file,
+                                             animdatalist, None, cached_projects, creature_projects)
+                pending = (animsetdata_file, creature_projects, previous, use_index, saved)
+
+        new_projects = [proj for proj in cached_projects if proj not in self.vanilla_projects]
+
+        if not self.dryrun:
+            self.animdata_list = animdatalist
+            self.animsetdata_list = animsetdatalist
+            self.pending_animsetdata = pending
+
+            self.cached_projects = cached_projects
+            self.new_projects = new_projects
+            self.creature_projects = creature_projects
+
+        logging.info("Update complete.")
+        return 0
+
+    def set_tables(self, animdatalist: table.ProjectTable, animsetdatalist: table.ProjectTable | None, written: dict = None):
+        # take tables that were built while writing the singlefiles (e.g. by an incremental
+        # append) instead of reading the files back in. written is handed to index.save_index.
+        # without animsetdatalist the animsetdata file wasn't touched, and whatever is known
+        # about it stays, parsed or still pending.
+        cfg = config.get_global('config')
+        self.dryrun = config.get_global('dryrun')
+
+        meshes_folder = cfg.skyrim / "meshes"
+
+        cached_projects = [entry.project_name.casefold() for entry in animdatalist]
+        creature_projects = [entry.project_name.casefold() for entry in animdatalist if entry.is_creature]
+
+        if self.dryrun:
+            return 0
+
+        pending = self.pending_animsetdata if animsetdatalist is None else None
+        if animsetdatalist is None and pending is None:
+            animsetdatalist = self.animsetdata_table
+
+        saved = index.save_index(cfg.cache, meshes_folder, meshes_folder / config.animdata, meshes_folder / config.animsetdata,
+                                 animdatalist, animsetdatalist, cached_projects, creature_projects, written)
+
+        self.animdata_list = animdatalist
+        self.animsetdata_list = animsetdatalist
+        if pending is not None:
+            # still parsed on first use, and added to the index that was just saved
+            animsetdata_file, creatures, previous, save, _ = pending
+            self.pending_animsetdata = (animsetdata_file, creatures, previous, save, saved)
+
+        self.cached_projects = cached_projects
+        self.new_projects = [proj for proj in cached_projects if proj not in self.vanilla_projects]
+        self.creature_projects = creature_projects
+        return 0
+
+    @property
+    def animsetdata_list(self) -> table.ProjectTable | None:
+        # parsed on first use, most commands only need the animdata projects
+        if self.pending_animsetdata is not None:
+            self.load_animsetdata()
+        return self.animsetdata_table
+
+    @animsetdata_list.setter
+    def animsetdata_list(self, animsetdatalist: table.ProjectTable | None):
+        self.pending_animsetdata = None
+        self.animsetdata_table = animsetdatalist
+
+    @timing.span("load_animsetdata")
+    def load_animsetdata(self):
+        animsetdata_file, creature_projects, previous, save, saved = self.pending_animsetdata
+
+        logging.debug("Updating animsetdata index...")
+        self.previous = previous
         try:
-            with open(animdata_file, "r", encoding="utf-8") as readable:
+            animsetdatalist = self.read_animsetdata(animsetdata_file, creature_projects)
+        finally:
+            self.previous = None
+
+        # only clear it once parsing worked, so a broken file fails every time it is asked for
+        self.pending_animsetdata = None
+        self.animsetdata_table = animsetdatalist
+
+        if save:
+            # the animdata half of the index was saved already, only the animsetdata is read for it
+            written = None
+            if saved is not None:
+                written = {"animdata": {"fingerprint": saved["animdata"], "blocks": saved["animdata_blocks"]}}
+
+            meshes_folder = animsetdata_file.parent
+            index.save_index(self.cache_dir, meshes_folder, meshes_folder / config.animdata, animsetdata_file,
+                             self.animdata_list, animsetdatalist, self.cached_projects, self.creature_projects, written)
+        return 0
+
+    def known_blocks(self, name: str) -> list[dict]:
+        # block hashes to check the front of a singlefile against before parsing it: the last
+        # saved state first, it covers the mods that were already there, then vanilla
+        candidates = []
+        if self.previous is not None and self.previous.get(f"{name}_blocks"):
+            candidates.append(dict(self.previous[f"{name}_blocks"], columns=self.previous[f"{name}_list"]))
+        if self.baseline:
+            candidates.append(self.baseline[name])
+        return candidates
+
+    @timing.span("read_animdata")
+    def read_animdata(self, animdata_file: Path):
+        try:
+            # map the file and parse counts straight from the raw bytes
+            with reader.SinglefileReader(animdata_file) as readable:
                 # bind repeated calls
                 readline = readable.readline
-                strip = str.strip
+                strip = bytes.strip
 
-                # initialize list to hold dictionaries before passing to dataframe
-                animdatalist = []                
-                
                 # initialize line counter
                 # Note: this will be the line number in the text file MINUS ONE
                 line_count = 0
@@ -93,114 +251,132 @@ class Updater:
                     # get project names
                     for i in range(total_projects):
                         myName_raw = readline()
-                        myName = strip(myName_raw).split(".")[0]
+                        myName = strip(myName_raw).decode("utf-8").split(".")[0]
                         p_dict[i] = myName
                         line_count += 1
                 except ValueError as e:
                     raise errors.ParseError(path=str(animdata_file), message=f"Failed to parse project name: {myName_raw} at line {line_count}: {e}") from e
 
-                # typical read loop
-                for i in range(total_projects):
-                    # Add new row for current project
-                    new_row = {
-                        "project_name": p_dict[i].lower(), # name of project
-                        "project_type": None, # whether it's a creature or noncreature project
-                        "project_start": line_count, # this is the line right before the project starts
-                        "project_end": None, # line number where project ends
-                        "lines_anims": 0, # expected number of lines for base anim data
-                        "lines_boundanims": 0 # expected number of lines for bound anim data. 0 if nonexistent.
-                        }
-
-                    # keep track of our line skips & reset at the beginning of the loop
-                    lines_skipped = 0
-
-                    try:
-                        # read line, this is the number of lines to expect for this project
-                        expected_lines_raw = readline()
-                        expected_lines = int(strip(expected_lines_raw))
-                    except ValueError as e:
-                        raise errors.ParseError(path=str(animdata_file), message=f"Invalid expected lines count '{expected_lines_raw}' at line {line_count}") from e
-
-                    new_row["lines_anims"] = expected_lines
-                    line_count += 1
-                    lines_skipped += 1
-                    
-                    # skip a line that is identical (1) on all projects
-                    util.fast_skip(readable, 1)
-                    line_count += 1
-                    lines_skipped += 1 
-                    
-                    try:
-                        # the next line tells us how many hkx to expect
-                        hkx_count_raw = readline()
-                        hkx_count = int(strip(hkx_count_raw))
-                        line_count += 1
-                        lines_skipped += 1
-                    except ValueError as e:
-                        raise errors.ParseError(path=str(animdata_file), message=f"Invalid HKX count '{hkx_count_raw!r}' at line {line_count}") from e
-
-                    util.fast_skip(readable, hkx_count)
-                    line_count += hkx_count
-                    lines_skipped += hkx_count
-
-                    try:
-                        # read boundanims flag
-                        hasBoundAnims_raw = readline()
-                        hasBoundAnims = int(strip(hasBoundAnims_raw))
-                        line_count += 1
-                    except ValueError as e:
-                        raise errors.ParseError(path=str(animdata_file), message=f"Unexpected value for boundanims flag: {hasBoundAnims_raw} at line {line_count}: {e}") from e
+                project_names = [p_dict[i] for i in range(total_projects)]
 
-                    # check for boundanims
-                    if hasBoundAnims == 0:
-                        new_row["project_type"]  = "noncreature"
+                # blocks at the front that are still the same are checked by hash instead of parsed
+                animdatalist = None
+                for blocks in self.known_blocks("animdata"):
+                    animdatalist, line_count = index.match_prefix(readable, table.AnimdataRecord, blocks, project_names, line_count)
+                    if animdatalist is not None:
+                        logging.debug(f"{len(animdatalist)} projects unchanged, parsing the other {len(project_names) - len(animdatalist)}.")
+                        project_names = project_names[len(animdatalist):]
+                        break
 
-                    elif hasBoundAnims == 1:
-                        new_row["project_type"]  = "creature"
-                    else:
-                        raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims flag '{hasBoundAnims_raw}' at line {line_count}")
-                    
-                    skip_animdata = expected_lines - lines_skipped
-                    util.fast_skip(readable, skip_animdata)
-                    line_count += skip_animdata
+                animdatalist = self.read_animdata_projects(readable, animdata_file, project_names, line_count, animdatalist)
+        except PermissionError as e:
+            raise PermissionError(f"Permission denied: {e}") from e
 
-                    if hasBoundAnims == 1:
-                        try:
-                            # read number of lines expected for bound anims
-                            expected_lines_raw = readline()
-                            expected_lines = int(strip(expected_lines_raw))
-                            line_count += 1
-                        except ValueError as e:
-                            raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims line count '{expected_lines_raw}' at line {line_count}: {e}") from e
+        return animdatalist
 
-                        # record expected bound anim line count
-                        new_row["lines_boundanims"] = expected_lines
+    def read_animdata_projects(self, readable, animdata_file: Path, project_names: list[str], line_count: int,
+                               animdatalist: table.ProjectTable = None):
+        # parse one project block per name, starting at the reader's current position.
+        # line_count is the line number the first block starts on.
+        readline = readable.readline
+        tell = readable.tell
+        skip = readable.skip
+        strip = bytes.strip
 
-                        # skip lines containing the actual bound anim data (including the final newline)
-                        util.fast_skip(readable, expected_lines)
-                        line_count += expected_lines
-                        
-                    # Mark the project end
-                    new_row["project_end"] = line_count
+        first_line = line_count
+        if animdatalist is None:
+            animdatalist = table.ProjectTable(table.AnimdataRecord)
 
-                    # append new row to list of rows
-                    animdatalist.append(new_row)
-                    i += 1
-        except PermissionError as e:
-            raise PermissionError(f"Permission denied: {e}") from e
-          
-        # saving local variables, will commit to class variables later
-        for entry in animdatalist:
-            cached_projects.append(entry['project_name'].casefold())
-            if entry['project_type'] == "creature":
-                creature_projects.append(entry['project_name'].casefold())
+        # typical read loop
+        for project_name in project_names:
+            # Add new row for current project
+            new_row = table.AnimdataRecord(project_name=project_name.lower(),
+                                           project_start=line_count,
+                                           anims_offset=tell())
 
-        new_projects = [proj for proj in cached_projects if proj not in self.vanilla_projects]
-        if self.dryrun:
-            # back up the old dataframe, restore it later
-            old_animdata_list = self.animdata_list
+            # keep track of our line skips & reset at the beginning of the loop
+            lines_skipped = 0
+
+            try:
+                # read line, this is the number of lines to expect for this project
+                expected_lines_raw = readline()
+                expected_lines = int(strip(expected_lines_raw))
+            except ValueError as e:
+                raise errors.ParseError(path=str(animdata_file), message=f"Invalid expected lines count '{expected_lines_raw}' at line {line_count}") from e
+
+            new_row.lines_anims = expected_lines
+            line_count += 1
+            lines_skipped += 1
             
-        logging.debug("Updating animsetdata index...")
+            # skip a line that is identical (1) on all projects
+            skip(1)
+            line_count += 1
+            lines_skipped += 1 
+            
+            try:
+                # the next line tells us how many hkx to expect
+                hkx_count_raw = readline()
+                hkx_count = int(strip(hkx_count_raw))
+                line_count += 1
+                lines_skipped += 1
+            except ValueError as e:
+                raise errors.ParseError(path=str(animdata_file), message=f"Invalid HKX count '{hkx_count_raw!r}' at line {line_count}") from e
+
+            skip(hkx_count)
+            line_count += hkx_count
+            lines_skipped += hkx_count
+
+            try:
+                # read boundanims flag
+                hasBoundAnims_raw = readline()
+                hasBoundAnims = int(strip(hasBoundAnims_raw))
+                line_count += 1
+            except ValueError as e:
+                raise errors.ParseError(path=str(animdata_file), message=f"Unexpected value for boundanims flag: {hasBoundAnims_raw} at line {line_count}: {e}") from e
+
+            # check for boundanims
+            if hasBoundAnims == 0:
+                new_row.project_type = "noncreature"
+
+            elif hasBoundAnims == 1:
+                new_row.project_type = "creature"
+            else:
+                raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims flag '{hasBoundAnims_raw}' at line {line_count}")
+            
+            skip_animdata = expected_lines - lines_skipped
+            skip(skip_animdata)
+            line_count += skip_animdata
+            new_row.anims_offset_end = tell()
+
+            if hasBoundAnims == 1:
+                new_row.boundanims_offset = tell()
+                try:
+                    # read number of lines expected for bound anims
+                    expected_lines_raw = readline()
+                    expected_lines = int(strip(expected_lines_raw))
+                    line_count += 1
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animdata_file), message=f"Invalid boundanims line count '{expected_lines_raw}' at line {line_count}: {e}") from e
+
+                # record expected bound anim line count
+                new_row.lines_boundanims = expected_lines
+
+                # skip lines containing the actual bound anim data (including the final newline)
+                skip(expected_lines)
+                line_count += expected_lines
+                new_row.boundanims_offset_end = tell()
+
+            # Mark the project end
+            new_row.project_end = line_count
+
+            # append new row to list of rows
+            animdatalist.append(new_row)
+
+        timing.count("lines processed", line_count - first_line)
+        return animdatalist
+
+    @timing.span("read_animsetdata")
+    def read_animsetdata(self, animsetdata_file: Path, creature_projects: list[str]):
         # first we need to find how many projects have boundanims + root motion
         project_count = len(creature_projects)
 
@@ -208,10 +384,11 @@ class Updater:
         line_count = 0
 
         # open the animsetdata file
-        with open(animsetdata_file, "r", encoding="utf-8") as readable:
+        with reader.SinglefileReader(animsetdata_file) as readable:
             # bind repeated calls
             readline = readable.readline
-            strip = str.strip
+            skip = readable.skip
+            strip = bytes.strip
             try:
                 logging.debug(f"Expecting {project_count} creature projects.")
 
@@ -228,125 +405,133 @@ class Updater:
                 line_count += 1
 
                 # skip project names, we already have them
-                util.fast_skip(readable, project_count)
+                skip(project_count)
                 line_count += project_count
 
-                animsetdatalist = []
+                animsetdatalist = None
+                for blocks in self.known_blocks("animsetdata"):
+                    animsetdatalist, line_count = index.match_prefix(readable, table.AnimsetRecord, blocks, creature_projects, line_count)
+                    if animsetdatalist is not None:
+                        logging.debug(f"{len(animsetdatalist)} creature projects unchanged, parsing the other {len(creature_projects) - len(animsetdatalist)}.")
+                        creature_projects = creature_projects[len(animsetdatalist):]
+                        break
 
-                for project_index in range(project_count):
-                    # get project name from cached creature list
-                    project_name = creature_projects[project_index]
-                    
-                    try:
-                        # record expected anim count
-                        set_count = int(strip(readline()))
-                        line_count += 1
-                    except ValueError as e:
-                        raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animationset count: {set_count} at line {line_count}: {e}") from e
-
-                    new_row = {
-                        "animset_name": project_name.lower(), # name of project
-                        "animset_start": line_count - 1, # line number where project starts
-                        "animset_end": None, # line number where project ends
-                        "lines_animsets": 0, # expected number of lines for base animset data
-                        "count_animsets": set_count # expected number of animsets
-                    }
-
-                    # skip the text file lines
-                    util.fast_skip(readable, set_count)
-                    line_count += set_count
-
-                    for i in range(set_count):
-                        # skip "V3"
-                        util.fast_skip(readable, 1)
-                        line_count += 1
+                animsetdatalist = self.read_animsetdata_projects(readable, animsetdata_file, creature_projects, line_count, animsetdatalist)
 
-                        try:
-                            # skip first set of notes (single line each)
-                            notes_A_raw = readline()
-                            notes_A = int(strip(notes_A_raw))
-                            line_count += 1
-                        except ValueError as e:
-                            raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animationset notes count: {notes_A_raw} at line {line_count}: {e}") from e
+            except (ValueError, IndexError, OSError) as e:
+                raise errors.CacheError(path=str(animsetdata_file), message=f"Error while updating animsetdata: {e}") from e
 
-                        if notes_A != 0:
-                            util.fast_skip(readable, notes_A)
-                            line_count += notes_A
-                        
-                        try:
-                            # skip second set of notes (sets of 3)
-                            notes_B_raw = readline()
-                            notes_B = int(strip(notes_B_raw))
-                            line_count += 1
-                        except ValueError as e:
-                            raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {notes_B_raw} at line {line_count}: {e}") from e
+        return animsetdatalist
 
-                        if notes_B != 0:
-                            util.fast_skip(readable, notes_B * 3) # notes B 3 lines
-                            line_count += notes_B * 3
+    def read_animsetdata_projects(self, readable, animsetdata_file: Path, creature_projects: list[str], line_count: int,
+                                  animsetdatalist: table.ProjectTable = None):
+        # parse one creature block per name, starting at the reader's current position
+        readline = readable.readline
+        tell = readable.tell
+        skip = readable.skip
+        strip = bytes.strip
 
-                        try:
-                            # skip third set of notes (sets of 4)
-                            notes_C_raw = readline()
-                            notes_C = int(strip(notes_C_raw))
-                            line_count += 1
-                        except ValueError as e:
-                            raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {notes_C_raw} at line {line_count}: {e}") from e
-
-                        # check for notes. each note is 4 lines.
-                        if notes_C != 0:
-                            for _ in range(notes_C):
-                                # skip two lines
-                                util.fast_skip(readable, 2)
-                                line_count += 2
-
-                                try:
-                                    # read number of lines to skip
-                                    n_raw = readline()
-                                    n = int(strip(n_raw))
-                                    line_count += 1
-                                except ValueError as e:
-                                    raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {n_raw} at line {line_count}: {e}") from e
-
-                                # skip 
-                                util.fast_skip(readable, n)
-                                line_count += n
+        first_line = line_count
+        if animsetdatalist is None:
+            animsetdatalist = table.ProjectTable(table.AnimsetRecord)
+
+        for project_name in creature_projects:
+            animset_offset = tell()
+
+            try:
+                # record expected anim count
+                set_count = int(strip(readline()))
+                line_count += 1
+            except ValueError as e:
+                raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animationset count: {set_count} at line {line_count}: {e}") from e
+
+            new_row = table.AnimsetRecord(animset_name=project_name.lower(),
+                                          animset_start=line_count - 1,
+                                          count_animsets=set_count,
+                                          animset_offset=animset_offset)
+
+            # skip the text file lines
+            skip(set_count)
+            line_count += set_count
+
+            for i in range(set_count):
+                # skip "V3"
+                skip(1)
+                line_count += 1
+
+                try:
+                    # skip first set of notes (single line each)
+                    notes_A_raw = readline()
+                    notes_A = int(strip(notes_A_raw))
+                    line_count += 1
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animationset notes count: {notes_A_raw} at line {line_count}: {e}") from e
+
+                if notes_A != 0:
+                    skip(notes_A)
+                    line_count += notes_A
+                
+                try:
+                    # skip second set of notes (sets of 3)
+                    notes_B_raw = readline()
+                    notes_B = int(strip(notes_B_raw))
+                    line_count += 1
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {notes_B_raw} at line {line_count}: {e}") from e
+
+                if notes_B != 0:
+                    skip(notes_B * 3) # notes B 3 lines
+                    line_count += notes_B * 3
+
+                try:
+                    # skip third set of notes (sets of 4)
+                    notes_C_raw = readline()
+                    notes_C = int(strip(notes_C_raw))
+                    line_count += 1
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {notes_C_raw} at line {line_count}: {e}") from e
+
+                # check for notes. each note is 4 lines.
+                if notes_C != 0:
+                    for _ in range(notes_C):
+                        # skip two lines
+                        skip(2)
+                        line_count += 2
 
                         try:
-                            # this line is the number of animations (three line pairs) to expect
-                            file_count_raw = readline()
-                            file_count = int(strip(file_count_raw))
-                            line_count +=1
+                            # read number of lines to skip
+                            n_raw = readline()
+                            n = int(strip(n_raw))
+                            line_count += 1
                         except ValueError as e:
-                            raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set file count: {file_count_raw} at line {line_count}: {e}") from e
+                            raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set notes count: {n_raw} at line {line_count}: {e}") from e
 
-                        # skip three lines per animation file
-                        # 2046540817 <- path to animations folder
-                        # 329189360 <- animation file name
-                        # 7891816 <- hkx extension (always same number, uses little-endian encoding)
+                        # skip 
+                        skip(n)
+                        line_count += n
 
-                        util.fast_skip(readable, file_count * 3)
-                        line_count += file_count * 3
+                try:
+                    # this line is the number of animations (three line pairs) to expect
+                    file_count_raw = readline()
+                    file_count = int(strip(file_count_raw))
+                    line_count +=1
+                except ValueError as e:
+                    raise errors.ParseError(path=str(animsetdata_file), message=f"Invalid animation set file count: {file_count_raw} at line {line_count}: {e}") from e
 
-                        if i == set_count - 1:
-                            new_row["animset_end"] = line_count - 1
-                            new_row["lines_animsets"] = (line_count) - new_row["animset_start"]
-                            
-                    animsetdatalist.append(new_row)
+                # skip three lines per animation file
+                # 2046540817 <- path to animations folder
+                # 329189360 <- animation file name
+                # 7891816 <- hkx extension (always same number, uses little-endian encoding)
 
-            except (ValueError, IndexError, OSError) as e:
-                raise errors.CacheError(path=str(animsetdata_file), message=f"Error while updating animsetdata: {e}") from e
+                skip(file_count * 3)
+                line_count += file_count * 3
 
-            if not self.dryrun:
-                self.animdata_list = animdatalist
-                self.animsetdata_list = animsetdatalist
+                if i == set_count - 1:
+                    new_row.animset_end = line_count - 1
+                    new_row.lines_animsets = (line_count) - new_row.animset_start
+                    
+            new_row.animset_offset_end = tell()
+            animsetdatalist.append(new_row)
 
-                self.cached_projects = cached_projects
-                self.new_projects = new_projects
-                self.creature_projects = creature_projects            
-            else:
-                # restore old animdata list
-                self.animdata_list = old_animdata_list
-            
-        logging.info("Update complete.")
-        return 0
\ No newline at end of file
+        timing.count("lines processed", line_count - first_line)
+        return animsetdatalist
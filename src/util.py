@@ -4,40 +4,78 @@ import os
 from pathlib import Path
 import json
 import logging
+import shutil
 import sys
 
 import sse_bsa
 
-import errors
+import errors, timing
 
 
-# needs optimizing
-def count_lines_and_strip(file: Path):
+CHUNK_SIZE = 1 << 20
 
-    with open(file, 'r', encoding="utf-8") as rfile:
-        line_count = 0
+# reads the file once in large binary chunks and returns (line_count, content).
+# line endings at the end of the file are not counted and are stripped from the content.
+# an empty file counts as one line, as it always has. every line is stripped of leading and
+# trailing whitespace, like the line by line copy did, and joined with `newline`.
+def count_lines_and_strip(file: Path, newline: bytes = b"\n") -> tuple[int, bytes]:
+    chunks = []
+    newlines = 0
 
-        # count total lines in file
-        for count, line in enumerate(rfile):
-            line_count = count
-        
-        line_count += 1  # adjust for 0 indexing
+    with open(file, 'rb') as rfile:
+        read = rfile.read
+        while True:
+            chunk = read(CHUNK_SIZE)
+            if not chunk:
+                break
+            newlines += chunk.count(b"\n")
+            chunks.append(chunk)
 
-        rfile.seek(0)
+    content = b"".join(chunks)
+    stripped = content.rstrip(b"\r\n")
+    timing.count("bytes read", len(content))
 
-        # count lines in file up to our recorded line count
-        for _ in range(line_count):
-            
-            line = rfile.readline()
+    if not stripped:
+        return 1, b""
 
-            # check if we're at the end of the file and the last line is blank
-            if rfile.tell() == os.fstat(rfile.fileno()).st_size and line.strip() == "\n":
-                line_count -= 1
+    # the final line ending and any blank lines after it don't count
+    newlines -= content.count(b"\n", len(stripped))
+    line_count = newlines + 1
+    timing.count("lines processed", line_count)
 
-                # return to the top
-                rfile.seek(0)
+    # strip() takes the \r of a CRLF ending too
+    return line_count, newline.join(line.strip() for line in stripped.split(b"\n"))
 
-    return line_count
+# copies `count` bytes starting at `start` in one open binary file onto the end of
+# another. copy_file_range lets the kernel do it without the data passing through
+# python, and on btrfs/XFS it only shares the extents instead of copying them.
+def copy_range(readable, writable, start: int, count: int) -> int:
+    writable.flush()
+    offset = start
+    end = start + count
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(readable.fileno(), writable.fileno(), end - offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError:
+            # not supported for these files, finish with a normal copy
+            pass
+        # the kernel moved the descriptor, catch the file object up
+        writable.seek(0, os.SEEK_END)
+
+    readable.seek(offset)
+    while offset < end:
+        chunk = readable.read(min(CHUNK_SIZE, end - offset))
+        if not chunk:
+            break
+        writable.write(chunk)
+        offset += len(chunk)
+
+    return offset - start
 
 def pause_wait_for_input():
     ("Press enter to continue...")
@@ -106,17 +144,53 @@ def resource_path(rel_path: str) -> Path:
     # Return the absolute path to the resource
     return (base / rel_path).resolve()
 
-def unpack_vanilla_cache(path):
+# pristine vanilla singlefiles, kept under the cache folder so restoring them doesn't open the BSA
+vanilla_dir = Path("vanilla")
+vanilla_source = Path("source.json")
+
+def copy_file(src: Path, dst: Path) -> int:
+    # copy_range shares the extents on btrfs/XFS, so this is a reflink where the drive supports it
+    with open(src, "rb") as readable, open(dst, "wb") as writable:
+        return copy_range(readable, writable, 0, os.fstat(readable.fileno()).st_size)
+
+def archive_key(archive: Path) -> dict:
+    stat = os.stat(archive)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def unpack_vanilla_cache(path, cache_dir: Path = None) -> Path:
+    # returns the folder the vanilla singlefiles were unpacked to, its meshes folder holds them.
+    # with a cache folder they are only unpacked again when the BSA changed.
+    archive = Path(path) / "Skyrim - Animations.bsa"
+    folder = Path(path) if cache_dir is None else Path(cache_dir) / vanilla_dir
+
     try:
-        anims_archive = sse_bsa.BSAArchive(Path(path / "Skyrim - Animations.bsa"))
-        anims_archive.extract_file(Path("meshes") / "animationdatasinglefile.txt", Path(path))
-        anims_archive.extract_file(Path("meshes") / "animationsetdatasinglefile.txt", Path(path))
+        if cache_dir is not None:
+            key = archive_key(archive)
+            try:
+                with open(folder / vanilla_source, "r", encoding="utf-8") as readable:
+                    if json.load(readable) == key:
+                        return folder
+            except (OSError, ValueError):
+                pass
+
+            # the old files and their index belong to another BSA
+            if folder.exists():
+                shutil.rmtree(folder)
+
+        anims_archive = sse_bsa.BSAArchive(archive)
+        anims_archive.extract_file(Path("meshes") / "animationdatasinglefile.txt", folder)
+        anims_archive.extract_file(Path("meshes") / "animationsetdatasinglefile.txt", folder)
+
+        # written last, the folder is only trusted once both files are there
+        if cache_dir is not None:
+            with open(folder / vanilla_source, "w", encoding="utf-8") as writable:
+                json.dump(key, writable)
     except (OSError, RuntimeError) as e:
         raise errors.CacheError(path=str(path), message=f"Failed to unpack vanilla cache: {e}") from e
-    return 0
+    return folder
 
 # check if a directory contains the files needed
-def check_valid_directory(path: Path | str) -> bool:
+def check_valid_directory(path: Path | str, cache_dir: Path = None) -> bool:
     # check for cache files
     path = Path(path)
     if (path / "meshes" / "animationdatasinglefile.txt").exists() and (path / "meshes" / "animationsetdatasinglefile.txt").exists():
@@ -130,7 +204,16 @@ def check_valid_directory(path: Path | str) -> bool:
                       message_n="Program cannot operate without the animation cache."):
             raise errors.UserAbort()
         # unpack BSA
-        unpack_vanilla_cache(path)
+        folder = unpack_vanilla_cache(path, cache_dir)
+        if folder != path:
+            try:
+                os.makedirs(path / "meshes", exist_ok=True)
+                for name in ("animationdatasinglefile.txt", "animationsetdatasinglefile.txt"):
+                    tmpfile = path / "meshes" / (name + ".tmp")
+                    copy_file(folder / "meshes" / name, tmpfile)
+                    os.replace(tmpfile, path / "meshes" / name)
+            except OSError as e:
+                raise errors.CacheError(path=str(path), message=f"Failed to copy vanilla cache: {e}") from e
         # check for cache files again
         if (path / "meshes" / "animationdatasinglefile.txt").exists() and (path / "meshes" / "animationsetdatasinglefile.txt").exists():
             return True
@@ -138,5 +221,3 @@ def check_valid_directory(path: Path | str) -> bool:
             raise errors.CacheError("Failed to unpack animation cache from BSA.")
     else:
         return False
-
-    
\ No newline at end of file
@@ -0,0 +1,462 @@
+import logging
+from pathlib import Path
+import queue
+import threading
+
+import errors, index, table, timing, util
+
+# enough threads to hide open/close latency on NTFS and network drives
+WRITER_THREADS = 4
+
+# bounded, so parsing never gets more than this many files ahead of the disk
+QUEUE_SIZE = 64
+
+class FileSink:
+    # Writes whole files from a few background threads. Callers hand over
+    # (path, bytes) and keep parsing, close() waits for every file to land
+    # and raises the first write that failed.
+
+    def __init__(self, threads: int = WRITER_THREADS, queue_size: int = QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.lock = threading.Lock()
+
+        self.threads = [threading.Thread(target=self.drain, name=f"FileSink-{i}", daemon=True) for i in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # don't hide the exception that got us here behind a write error
+        self.close(raise_errors=exc_type is None)
+        return False
+
+    def drain(self):
+        get = self.queue.get
+        while True:
+            item = get()
+            if item is None:
+                return
+
+            path, data = item
+
+            # something already failed, the output is going to be thrown away anyway
+            if self.error is not None:
+                continue
+
+            try:
+                with open(path, "wb") as writable:
+                    writable.write(data)
+            except (OSError, PermissionError) as e:
+                self.fail(errors.WriteError(path=str(path), message=f"Could not write {path}: {e}"))
+            except Exception as e:
+                # anything else would kill the thread, and once they're all gone write() blocks forever.
+                # keep draining, close() raises it.
+                self.fail(e)
+
+    def fail(self, error: Exception):
+        # only the first error is kept
+        with self.lock:
+            if self.error is None:
+                self.error = error
+
+    def write(self, path, data: bytes):
+        # the parent folder has to exist already
+        if self.error is not None:
+            raise self.error
+        self.queue.put((path, data))
+        timing.count("bytes written", len(data))
+
+    def close(self, raise_errors: bool = True):
+        if self.threads:
+            for _ in self.threads:
+                self.queue.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+
+        if raise_errors and self.error is not None:
+            raise self.error
+        return 0
+
+# write buffer for the singlefiles, most project blocks are a few KB
+BUFFER_SIZE = 1 << 20
+
+class BlockHashes:
+    # The hashes index.save_index keeps of a singlefile, its header's and then every block's,
+    # built up while the file is written. A block runs up to where the next one starts, so
+    # the one being written stays open until the next block begins.
+
+    def __init__(self):
+        self.hashes = []
+        self.current = index.block_hasher()
+
+    def update(self, data: bytes):
+        self.current.update(data)
+
+    def next_block(self):
+        self.hashes.append(self.current.hexdigest())
+        self.current = index.block_hasher()
+
+    def extend(self, hashes: list[str]):
+        # whole blocks that were copied as they are, with their stored hashes
+        self.next_block()
+        self.hashes.extend(hashes)
+
+    def finish(self) -> list[str]:
+        return self.hashes + [self.current.hexdigest()]
+
+class SinglefileWriter:
+    # Writes animationdatasinglefile.txt and animationsetdatasinglefile.txt in one pass.
+    # The headers need every name before the first block, so they are written from the
+    # name lists up front, then blocks are streamed after them from project records or
+    # copied as raw ranges of an old singlefile. Every block is checked as it goes out and
+    # its index row is built on the way, so the files never have to be read back.
+
+    def __init__(self, animdata_file: Path, animsetdata_file: Path = None, newline: bytes = b"\r\n", buffer_size: int = BUFFER_SIZE):
+        # without an animsetdata file only the animdata is written, for when no creature changes
+        self.animdata_file = Path(animdata_file)
+        self.animsetdata_file = Path(animsetdata_file) if animsetdata_file is not None else None
+        self.newline = newline
+
+        self.animdata = None
+        self.animsetdata = None
+
+        # counts from the headers, and what has been written since
+        self.expected_projects = None
+        self.expected_creatures = None
+        self.projects = 0
+        self.creatures = 0
+
+        # rows of everything written so far, None once a copied run couldn't be indexed
+        self.animdata_rows = table.ProjectTable(table.AnimdataRecord)
+        self.animsetdata_rows = table.ProjectTable(table.AnimsetRecord) if animsetdata_file is not None else None
+
+        # block hashes for the index, None once a copied run came without them
+        self.animdata_hashes = BlockHashes()
+        self.animsetdata_hashes = BlockHashes() if animsetdata_file is not None else None
+
+        # where the next block starts in each file, as byte offset and line number
+        self.animdata_offset = 0
+        self.animsetdata_offset = 0
+        self.animdata_line = 0
+        self.animsetdata_line = 0
+
+        # a creature's bound anims are closed with a blank line, but only once another project follows
+        self.separate = False
+
+        try:
+            self.animdata = open(self.animdata_file, "wb", buffering=buffer_size)
+            if self.animsetdata_file is not None:
+                self.animsetdata = open(self.animsetdata_file, "wb", buffering=buffer_size)
+        except OSError as e:
+            self.close(check=False)
+            raise errors.WriteError(path=str(e.filename), message=f"Could not create {e.filename}: {e}") from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # don't hide the exception that got us here behind a count mismatch
+        self.close(check=exc_type is None)
+        return False
+
+    def write_headers(self, project_names: list[str], creature_names: list[str]):
+        # names as they appear in the headers, "catproject.txt" and "catprojectdata\catproject.txt"
+        newline = self.newline
+        self.expected_projects = len(project_names)
+        self.expected_creatures = len(creature_names)
+
+        try:
+            header = b"%d" % len(project_names) + newline + b"".join(name.encode("utf-8") + newline for name in project_names)
+            self.animdata.write(header)
+            self.animdata_hashes.update(header)
+            self.animdata_offset += len(header)
+            self.animdata_line += 1 + len(project_names)
+
+            if self.animsetdata is not None:
+                header = b"%d" % len(creature_names) + newline + b"".join(name.encode("utf-8") + newline for name in creature_names)
+                self.animsetdata.write(header)
+                self.animsetdata_hashes.update(header)
+                self.animsetdata_offset += len(header)
+                self.animsetdata_line += 1 + len(creature_names)
+        except OSError as e:
+            raise errors.WriteError(path=str(self.animdata_file), message=f"Could not write singlefile headers: {e}") from e
+        return 0
+
+    @timing.span("write_project")
+    def write_project(self, project):
+        # takes anything with project_name, is_creature, anims, boundanims and animset. anims and
+        # boundanims run from their line count to the end of their block, animset is the creature's
+        # whole animsetdata block. all of them use this writer's line endings.
+        newline = self.newline
+        if project.is_creature and self.animsetdata is not None and project.animset is None:
+            # e.g. a record from project.iter_animdata without its animsetdata file
+            raise errors.CacheError(path=str(self.animsetdata_file), message=f"{project.project_name} is a creature but has no animsetdata to write.")
+
+        anims = self.terminated(project.anims)
+        # the blank line that closes these is written when the next project starts
+        boundanims = project.boundanims.rstrip(b"\r\n") + newline if project.is_creature else None
+        animset = self.terminated(project.animset) if project.is_creature and self.animsetdata is not None else None
+
+        # check everything before writing anything, a bad block never reaches the file
+        row = self.animdata_row(project, anims, boundanims)
+        animset_row = self.animset_row(project, animset) if animset is not None else None
+
+        try:
+            if self.separate:
+                self.animdata.write(newline)
+                self.animdata_offset += len(newline)
+                # the blank line belongs to the creature before it
+                if self.animdata_rows:
+                    self.animdata_rows[-1].boundanims_offset_end += len(newline)
+                if self.animdata_hashes is not None:
+                    self.animdata_hashes.update(newline)
+
+            row.anims_offset = self.animdata_offset
+            row.anims_offset_end = row.anims_offset + len(anims)
+            self.animdata.write(anims)
+
+            if boundanims is not None:
+                row.boundanims_offset = row.anims_offset_end
+                row.boundanims_offset_end = row.boundanims_offset + len(boundanims)
+                self.animdata.write(boundanims)
+
+            if self.animdata_hashes is not None:
+                self.animdata_hashes.next_block()
+                self.animdata_hashes.update(anims)
+                if boundanims is not None:
+                    self.animdata_hashes.update(boundanims)
+
+            if animset_row is not None:
+                animset_row.animset_offset = self.animsetdata_offset
+                animset_row.animset_offset_end = self.animsetdata_offset + len(animset)
+                self.animsetdata.write(animset)
+                if self.animsetdata_hashes is not None:
+                    self.animsetdata_hashes.next_block()
+                    self.animsetdata_hashes.update(animset)
+        except OSError as e:
+            raise errors.WriteError(path=str(self.animdata_file), message=f"Could not write {project.project_name}: {e}") from e
+
+        self.animdata_offset = row.boundanims_offset_end or row.anims_offset_end
+        self.animdata_line = row.project_end
+        if self.animdata_rows is not None:
+            self.animdata_rows.append(row)
+
+        if animset_row is not None:
+            self.animsetdata_offset = animset_row.animset_offset_end
+            self.animsetdata_line += animset.count(b"\n")
+            if self.animsetdata_rows is not None:
+                self.animsetdata_rows.append(animset_row)
+            self.creatures += 1
+
+        self.separate = project.is_creature
+        self.projects += 1
+        return 0
+
+    def animdata_row(self, project, anims: bytes, boundanims: bytes | None) -> table.AnimdataRecord:
+        # the same checks and numbers update.read_animdata_projects gets from reading the block back
+        lines = anims.split(b"\n")
+        try:
+            lines_anims = int(lines[0])
+            hkx_count = int(lines[2])
+            has_boundanims = int(lines[3 + hkx_count])
+        except (ValueError, IndexError) as e:
+            raise errors.CacheError(path=str(self.animdata_file), message=f"Invalid anim data for {project.project_name}: {e}") from e
+
+        # the count doesn't include its own line
+        if len(lines) - 2 != lines_anims:
+            raise errors.CacheError(path=str(self.animdata_file), message=f"Anim data for {project.project_name} has {len(lines) - 2} lines, its line count says {lines_anims}.")
+        if has_boundanims != int(project.is_creature):
+            raise errors.CacheError(path=str(self.animdata_file), message=f"Boundanims flag of {project.project_name} is {has_boundanims}, expected {int(project.is_creature)}.")
+
+        row = table.AnimdataRecord(project_name=project.project_name.lower(),
+                                   project_type="creature" if project.is_creature else "noncreature",
+                                   project_start=self.animdata_line,
+                                   lines_anims=lines_anims)
+        line_count = self.animdata_line + 1 + lines_anims
+
+        if boundanims is not None:
+            try:
+                lines_boundanims = int(boundanims[:boundanims.index(b"\n")])
+            except ValueError as e:
+                raise errors.CacheError(path=str(self.animdata_file), message=f"Invalid boundanims line count for {project.project_name}: {e}") from e
+
+            # the count covers the blank line after the block too, which isn't written yet
+            found = boundanims.count(b"\n")
+            if found != lines_boundanims:
+                raise errors.CacheError(path=str(self.animdata_file), message=f"Bound anims for {project.project_name} have {found - 1} lines, their line count says {lines_boundanims - 1}.")
+            row.lines_boundanims = lines_boundanims
+            line_count += 1 + lines_boundanims
+
+        row.project_end = line_count
+        return row
+
+    def animset_row(self, project, animset: bytes) -> table.AnimsetRecord:
+        # walks the block the way update.read_animsetdata_projects does and checks every count adds up
+        lines = animset.split(b"\n")
+        i = 0
+        try:
+            set_count = int(lines[i])
+            i += 1 + set_count
+
+            for _ in range(set_count):
+                # "V3", then notes of one, three and 3 + n lines, then 3 lines per animation
+                i += 1
+                notes_a = int(lines[i])
+                i += 1 + notes_a
+                notes_b = int(lines[i])
+                i += 1 + notes_b * 3
+                notes_c = int(lines[i])
+                i += 1
+                for _ in range(notes_c):
+                    i += 2
+                    n = int(lines[i])
+                    i += 1 + n
+                file_count = int(lines[i])
+                i += 1 + file_count * 3
+        except (ValueError, IndexError) as e:
+            raise errors.CacheError(path=str(self.animsetdata_file), message=f"Invalid animsetdata for {project.project_name} at line {i} of its block: {e}") from e
+
+        if i != len(lines) - 1:
+            raise errors.CacheError(path=str(self.animsetdata_file), message=f"Animsetdata for {project.project_name} has {len(lines) - 1} lines, its counts add up to {i}.")
+
+        row = table.AnimsetRecord(animset_name=project.project_name.lower(),
+                                  animset_start=self.animsetdata_line,
+                                  count_animsets=set_count)
+        if set_count:
+            row.animset_end = self.animsetdata_line + i - 1
+            row.lines_animsets = i
+        return row
+
+    @timing.span("copy_animdata")
+    def copy_animdata(self, source: Path, start: int, end: int, rows: table.ProjectTable, hashes: list[str] = None):
+        # copy a run of existing blocks as they are, without parsing them. rows are the index
+        # of those blocks in source, they are moved to where the blocks land. hashes are the
+        # stored hashes of the same blocks, without them the new file is read again to index it.
+        offset = self.animdata_offset
+        self.animdata_hashes, hash_from = self.copied_hashes(self.animdata_hashes, rows, hashes, start)
+        self.animdata_offset = self.copy_range(self.animdata, source, start, end, self.animdata_hashes, hash_from)
+        self.projects += len(rows)
+        if not rows:
+            return 0
+
+        self.separate = rows[-1].is_creature
+        moved = self.moved_rows(rows, end, offset - start, self.animdata_line - rows[0].project_start, self.animdata_offset)
+        self.animdata_rows = self.joined_rows(self.animdata_rows, moved)
+        self.animdata_line = rows[-1].project_end + self.animdata_line - rows[0].project_start
+        return 0
+
+    @timing.span("copy_animsetdata")
+    def copy_animsetdata(self, source: Path, start: int, end: int, rows: table.ProjectTable, hashes: list[str] = None):
+        offset = self.animsetdata_offset
+        self.animsetdata_hashes, hash_from = self.copied_hashes(self.animsetdata_hashes, rows, hashes, start)
+        self.animsetdata_offset = self.copy_range(self.animsetdata, source, start, end, self.animsetdata_hashes, hash_from)
+        self.creatures += len(rows)
+        if not rows:
+            return 0
+
+        last = rows[-1]
+        next_line = (last.animset_end if last.animset_end is not None else last.animset_start) + 1
+        moved = self.moved_rows(rows, end, offset - start, self.animsetdata_line - rows[0].animset_start, self.animsetdata_offset)
+        self.animsetdata_rows = self.joined_rows(self.animsetdata_rows, moved)
+        self.animsetdata_line = next_line + self.animsetdata_line - rows[0].animset_start
+        return 0
+
+    def copied_hashes(self, block_hashes: BlockHashes | None, rows: table.ProjectTable, hashes: list[str] | None,
+                      start: int) -> tuple[BlockHashes | None, int]:
+        # takes the stored hashes of every copied block but the last, that one may end up with a
+        # newline it didn't have, and the blank line after a creature is only added later. returns
+        # the hashes to go on with and where in source the bytes still to be hashed start.
+        if block_hashes is None or not rows:
+            return block_hashes, start
+
+        start_field = rows.record_type.offset_fields[0]
+        if hashes is None or len(hashes) != len(rows) or getattr(rows[0], start_field) != start:
+            return None, start
+
+        block_hashes.extend(hashes[:-1])
+        return block_hashes, getattr(rows[-1], start_field)
+
+    def moved_rows(self, rows: table.ProjectTable, end: int, offset_delta: int, line_delta: int, new_end: int) -> table.ProjectTable | None:
+        # rows can only be moved if their last block runs right up to the end of the copied range,
+        # anything after it (trailing blank lines...) would shift the blocks written next
+        end_field = next(field for field in reversed(rows.record_type.offset_fields) if getattr(rows[-1], field) is not None)
+        if getattr(rows[-1], end_field) != end:
+            logging.debug("Copied blocks are followed by other data, can't index the new file as it is written.")
+            return None
+
+        moved = rows.shifted(offset_delta, line_delta)
+        # the copy may have had to terminate the last line
+        setattr(moved[-1], end_field, new_end)
+        return moved
+
+    def joined_rows(self, rows: table.ProjectTable | None, more: table.ProjectTable | None) -> table.ProjectTable | None:
+        if rows is None or more is None:
+            return None
+        if not rows:
+            return more
+        for row in more:
+            rows.append(row)
+        return rows
+
+    def copy_range(self, writable, source: Path, start: int, end: int, block_hashes: BlockHashes | None = None, hash_from: int = 0) -> int:
+        # returns where the copy ends in writable. what's copied from hash_from on is added to block_hashes,
+        # the blocks before it are hashed already.
+        try:
+            with open(source, "rb") as readable:
+                util.copy_range(readable, writable, start, end - start)
+                if block_hashes is not None and end > hash_from:
+                    readable.seek(hash_from)
+                    block_hashes.update(readable.read(end - hash_from))
+
+                # the next block has to start on a line of its own
+                if end > start:
+                    readable.seek(end - 1)
+                    if readable.read(1) != b"\n":
+                        writable.write(self.newline)
+                        if block_hashes is not None:
+                            block_hashes.update(self.newline)
+            return writable.tell()
+        except OSError as e:
+            raise errors.WriteError(path=str(source), message=f"Error copying from old cache file: {e}") from e
+
+    def animdata_written(self) -> dict | None:
+        # for index.save_index once the writer is closed, None if the new file has to be read to index it
+        return self.written(self.animdata_rows, self.animdata_hashes, self.animdata_offset)
+
+    def animsetdata_written(self) -> dict | None:
+        return self.written(self.animsetdata_rows, self.animsetdata_hashes, self.animsetdata_offset)
+
+    def written(self, rows: table.ProjectTable | None, block_hashes: BlockHashes | None, size: int) -> dict | None:
+        if rows is None or block_hashes is None:
+            return None
+        return index.describe_written(rows, size, block_hashes.finish())
+
+    def terminated(self, block: bytes) -> bytes:
+        return block if block.endswith(b"\n") else block + self.newline
+
+    def close(self, check: bool = True):
+        error = None
+        if self.animdata is not None:
+            timing.count("bytes written", self.animdata_offset + self.animsetdata_offset)
+        for writable in (self.animdata, self.animsetdata):
+            if writable is not None:
+                try:
+                    writable.close()
+                except OSError as e:
+                    error = error or e
+        self.animdata = None
+        self.animsetdata = None
+
+        if not check:
+            return 0
+        if error is not None:
+            raise errors.WriteError(path=str(self.animdata_file), message=f"Could not finish writing the singlefiles: {error}") from error
+        if self.projects != self.expected_projects:
+            raise errors.CacheError(path=str(self.animdata_file), message=f"Wrote {self.projects} projects but the header lists {self.expected_projects}.")
+        if self.animsetdata_file is not None and self.creatures != self.expected_creatures:
+            raise errors.CacheError(path=str(self.animsetdata_file), message=f"Wrote {self.creatures} creature projects but the header lists {self.expected_creatures}.")
+        return 0
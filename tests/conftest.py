@@ -0,0 +1,56 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# the modules import each other by their flat names, the same way __main__ runs them
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root / "src"))
+sys.path.insert(0, str(root / "benchmarks"))
+
+import config, update
+import generate
+
+class Workspace:
+    # A Data, cache and backups folder under tmp_path with its own config and Updater,
+    # set as the globals the same way __main__ does.
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.meshes = root / "Data" / "meshes"
+
+        self.cfg = config.Configurator()
+        self.cfg.skyrim = root / "Data"
+        self.cfg.cache = root / "cache"
+        self.cfg.backups = root / "backups"
+        os.makedirs(self.cfg.cache, exist_ok=True)
+        self.reset()
+
+    def reset(self):
+        # a new Updater, as if the program was started again
+        self.ud = update.Updater()
+        config.set_globals(self.cfg, self.ud, yes_im_sure=True)
+        return self.ud
+
+    def generate(self, projects: int, prefix: str, newline: str, seed: int) -> tuple[list[str], list[str]]:
+        return generate.generate(self.meshes, projects, 0.4, 2, 2, 3, 4, prefix, newline, seed)
+
+    def read(self, name: Path) -> bytes:
+        return (self.meshes / name).read_bytes()
+
+@pytest.fixture(params=["\r\n", "\n"], ids=["crlf", "lf"])
+def newline(request) -> str:
+    return request.param
+
+@pytest.fixture
+def make_workspace(tmp_path):
+    return lambda name: Workspace(tmp_path / name)
+
+@pytest.fixture
+def workspace(make_workspace):
+    return make_workspace("base")
+
+@pytest.fixture
+def mods(make_workspace):
+    return make_workspace("mods")
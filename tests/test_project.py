@@ -0,0 +1,37 @@
+import config, project
+
+def test_iter_animdata_matches_the_index(workspace, newline):
+    names, creature_names = workspace.generate(15, "Van", newline, seed=7)
+    workspace.reset().update_cache()
+    ud = workspace.ud
+
+    records = list(project.iter_animdata(workspace.meshes / config.animdata, workspace.meshes / config.animsetdata))
+    assert [record.project_name for record in records] == names
+
+    animset = workspace.read(config.animsetdata)
+    for record, row in zip(records, ud.animdata_list):
+        assert record.is_creature == row.is_creature
+        assert (record.line, record.offset) == (row.project_start, row.anims_offset)
+        assert record.anims == workspace.read(config.animdata)[row.anims_offset:row.anims_offset_end]
+
+        if record.is_creature:
+            animset_row = ud.animsetdata_list.get(record.project_name)
+            assert record.animset == animset[animset_row.animset_offset:animset_row.animset_offset_end]
+        else:
+            assert record.boundanims is None and record.animset is None
+
+def test_records_parse_hkx_clips_and_motion(workspace, newline):
+    names, creature_names = workspace.generate(10, "Van", newline, seed=8)
+    creatures = set(creature_names)
+
+    for record in project.iter_animdata(workspace.meshes / config.animdata):
+        # the generator gives every project 3 hkx files, and every creature 4 clips with root motion
+        assert record.hkx_files == [f"Actors\\{record.project_name}\\Behaviors\\Behavior{i}.hkx" for i in range(3)]
+        if record.project_name in creatures:
+            assert [clip.name for clip in record.clips] == [f"Clip{i}" for i in range(4)]
+            assert all(trigger.startswith(f"Event{i}:") for clip in record.clips for i, trigger in enumerate(clip.triggers))
+            assert [clip.clip_id for clip in record.clips] == [str(i) for i in range(4)]
+            assert [motion.clip_id for motion in record.motion] == [str(i) for i in range(4)]
+            assert all(motion.translations and motion.rotations for motion in record.motion)
+        else:
+            assert record.clips == [] and record.motion == []
@@ -0,0 +1,158 @@
+import contextlib
+import io
+import json
+import shutil
+from pathlib import Path
+
+import append, config, extract, index, project, system, update, writer
+
+def extracted_mods(mods, newline: str) -> tuple[list[str], set[str]]:
+    # loose projects to append, from extracting a second generated cache
+    names, creature_names = mods.generate(6, "Mod", newline, seed=2)
+    mods.reset().update_cache()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract.extract_all()
+    return [name.lower() for name in names], set(name.lower() for name in creature_names)
+
+def copy_loose_projects(source, destination):
+    for folder in (config.animdata_dir, config.animsetdata_dir):
+        shutil.copytree(source.cfg.skyrim / folder, destination.cfg.skyrim / folder)
+
+def indent_loose_projects(workspace, newline: str):
+    # hand edited loose files often have indented lines and trailing spaces, append strips them
+    for path in (workspace.cfg.skyrim / config.animdata_dir).rglob("*.txt"):
+        lines = path.read_bytes().decode("utf-8").split(newline)
+        path.write_bytes(newline.join(f"  {line}\t" if line else line for line in lines).encode("utf-8"))
+
+def loose_lines(file: Path) -> list[str]:
+    # the loose file's lines the way the old append read them, stripped one by one
+    return [line.strip() for line in file.read_text(encoding="utf-8").splitlines()]
+
+def baseline_append(workspace, project_list: list[str], creatures: set[str]) -> tuple[bytes, bytes]:
+    # the singlefiles the line by line append this replaced wrote for the same projects
+    animdata = loose_lines(workspace.meshes / config.animdata)
+    animsetdata = loose_lines(workspace.meshes / config.animsetdata)
+    project_count = int(animdata[0])
+    creature_count = int(animsetdata[0])
+    last_is_creature = workspace.ud.animdata_list[-1].is_creature
+
+    appended_creatures = [name for name in project_list if name in creatures]
+    animdata = ([str(project_count + len(project_list))] + animdata[1:1 + project_count]
+                + [f"{name}.txt" for name in project_list] + animdata[1 + project_count:])
+    animsetdata = ([str(creature_count + len(appended_creatures))] + animsetdata[1:1 + creature_count]
+                   + [f"{name}data\\{name}.txt" for name in appended_creatures] + animsetdata[1 + creature_count:])
+
+    loose = workspace.cfg.skyrim / config.animdata_dir
+    loose_sets = workspace.cfg.skyrim / config.animsetdata_dir
+    for name in project_list:
+        is_creature = name in creatures
+        if last_is_creature:
+            animdata.append("")
+
+        anims = loose_lines(loose / f"{name}.txt")
+        animdata += [str(len(anims) + 1 if is_creature else len(anims))] + anims
+        if is_creature:
+            boundanims = loose_lines(loose / "boundanims" / f"anims_{name}.txt")
+            animdata += ["", str(len(boundanims) + 1)] + boundanims
+
+            entries = loose_lines(loose_sets / f"{name}data" / f"{name}.txt")
+            animsetdata += [str(len(entries))] + entries
+            for entry in entries:
+                animsetdata += loose_lines(loose_sets / f"{name}data" / entry)
+        last_is_creature = is_creature
+
+    return ("\n".join(animdata) + "\n").encode("utf-8"), ("\n".join(animsetdata) + "\n").encode("utf-8")
+
+def appended(workspace, mods, newline: str) -> tuple[bytes, bytes]:
+    workspace.generate(12, "Van", newline, seed=1)
+    project_list, creatures = extracted_mods(mods, newline)
+    copy_loose_projects(mods, workspace)
+    indent_loose_projects(workspace, newline)
+    workspace.reset().update_cache()
+
+    expected = baseline_append(workspace, project_list, creatures)
+    with contextlib.redirect_stdout(io.StringIO()):
+        append.append_projects(project_list)
+    return expected
+
+def test_append_matches_baseline(workspace, mods, newline):
+    expected_animdata, expected_animsetdata = appended(workspace, mods, newline)
+
+    # the old append wrote "\n" through text mode, which is the file's own line ending on Windows
+    assert workspace.read(config.animdata) == expected_animdata.replace(b"\n", newline.encode("utf-8"))
+    assert workspace.read(config.animsetdata) == expected_animsetdata.replace(b"\n", newline.encode("utf-8"))
+
+def test_index_after_append_matches_cold_parse(workspace, mods, newline):
+    appended(workspace, mods, newline)
+    saved = json.loads((workspace.cfg.cache / index.index_file).read_text(encoding="utf-8"))
+
+    # the tables the append handed over, against reading the new files from scratch
+    cold = update.Updater()
+    animdata_list = cold.read_animdata(workspace.meshes / config.animdata)
+    creatures = [row.project_name for row in animdata_list if row.is_creature]
+    animsetdata_list = cold.read_animsetdata(workspace.meshes / config.animsetdata, creatures)
+
+    ud = workspace.ud
+    assert ud.animdata_list.to_dict() == animdata_list.to_dict()
+    assert ud.animsetdata_list.to_dict() == animsetdata_list.to_dict()
+
+    # and the index the append saved, against one made by reading both files
+    rebuilt = index.save_index(workspace.cfg.cache, workspace.meshes, workspace.meshes / config.animdata,
+                               workspace.meshes / config.animsetdata, animdata_list, animsetdata_list,
+                               ud.cached_projects, ud.creature_projects)
+    assert saved["animdata"] == rebuilt["animdata"]
+    assert saved["animdata_list"] == rebuilt["animdata_list"]
+    assert saved["animdata_blocks"] == rebuilt["animdata_blocks"]
+    if saved["animsetdata_list"] is not None:
+        assert saved["animsetdata"] == rebuilt["animsetdata"]
+        assert saved["animsetdata_list"] == rebuilt["animsetdata_list"]
+        assert saved["animsetdata_blocks"] == rebuilt["animsetdata_blocks"]
+
+def loose_tree(workspace) -> dict[str, bytes]:
+    files = {}
+    for folder in (config.animdata_dir, config.animsetdata_dir):
+        for path in sorted((workspace.cfg.skyrim / folder).rglob("*")):
+            if path.is_file():
+                files[str(path.relative_to(workspace.cfg.skyrim))] = path.read_bytes()
+    return files
+
+def test_parallel_extract_matches_sequential(make_workspace, newline):
+    trees = []
+    for jobs in (1, 3):
+        workspace = make_workspace(f"jobs{jobs}")
+        names, _ = workspace.generate(20, "Van", newline, seed=4)
+        workspace.reset().update_cache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract.extract_projects([name.lower() for name in names], jobs)
+        trees.append(loose_tree(workspace))
+
+    assert trees[0]
+    assert trees[0] == trees[1]
+
+def test_backup_restores_the_saved_files(workspace, newline):
+    workspace.generate(15, "Van", newline, seed=5)
+    workspace.reset().update_cache()
+    original = (workspace.read(config.animdata), workspace.read(config.animsetdata))
+
+    system.save_backup()
+    for name in (config.animdata, config.animsetdata):
+        (workspace.meshes / name).write_bytes(b"0" + newline.encode("utf-8"))
+
+    workspace.reset()
+    system.load_backup()
+    assert (workspace.read(config.animdata), workspace.read(config.animsetdata)) == original
+
+def test_iter_animdata_and_writer_reproduce_the_files(workspace, newline, tmp_path):
+    workspace.generate(15, "Van", newline, seed=6)
+    animdata_file = workspace.meshes / config.animdata
+    animsetdata_file = workspace.meshes / config.animsetdata
+    names, _ = append.read_header(animdata_file)
+    creature_names, _ = append.read_header(animsetdata_file)
+
+    with writer.SinglefileWriter(tmp_path / "animdata.txt", tmp_path / "animsetdata.txt", newline.encode("utf-8")) as out:
+        out.write_headers(names, creature_names)
+        for record in project.iter_animdata(animdata_file, animsetdata_file):
+            out.write_project(record)
+
+    assert (tmp_path / "animdata.txt").read_bytes() == animdata_file.read_bytes()
+    assert (tmp_path / "animsetdata.txt").read_bytes() == animsetdata_file.read_bytes()